@@ -0,0 +1,411 @@
+"""
+Нагрузочный замер nuUpdater на локальной заглушке Celestrak.
+
+    python nuBench.py                                   — 500 спутников, 5 циклов
+    python nuBench.py --sats 2000 --latency 0.05 --error-rate 0.05 --json bench.json
+
+Запускает в этом же процессе HTTP-сервер, отвечающий как gp.php
+(CATNR=... и GROUP=...), с заданной задержкой, долей ошибок 503/403 и
+размером каталога, и гоняет через него TleEngine.download_tles без окна.
+Печатает пропускную способность (получено спутников/с), p50/p95 длительности
+цикла, пиковую память и объём переданных данных; с --json пишет те же
+результаты в файл, чтобы сравнивать прогоны между версиями.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import nuCore
+from nuCore import (
+    APP_VERSION,
+    DEFAULT_RATE_PER_SECOND,
+    STATUS_FRESH,
+    TleEngine,
+    HttpCache,
+    TleArchive,
+    tle_checksum,
+)
+
+# Номера по каталогу заглушки: FIRST_CATNR, FIRST_CATNR + 1, ...
+FIRST_CATNR = 10000
+# Эпоха каталога заглушки в начале прогона (день 2026 года)
+MOCK_EPOCH_DAY = 290.5
+
+
+# ==========================
+# ЗАГЛУШКА CELESTRAK
+# ==========================
+def mock_tle(catnr, epoch_day):
+    """Корректный TLE-блок (3 строки) для номера catnr."""
+    line1 = f"1 {catnr:05d}U 98067A   26{epoch_day:012.8f}  .00001234  00000-0  12345-4 0  999"
+    line1 += str(tle_checksum(line1))
+    line2 = f"2 {catnr:05d}  51.6400 208.9163 0006317  69.9862 290.1234 15.50000000123456"[:68]
+    line2 += str(tle_checksum(line2))
+    return f"BENCH {catnr}\n{line1}\n{line2}\n"
+
+
+class MockCelestrak:
+    """
+    Локальный HTTP-сервер вместо celestrak.org. Настройки (задержка, доли
+    ошибок, каталог) можно менять между циклами; счётчики запросов и байт
+    общие для всех потоков сервера.
+    """
+
+    def __init__(self, catalog_size, latency=0.0, jitter=0.0, error_rate=0.0,
+                 forbidden_rate=0.0, etags=True, seed=1):
+        self.catalog_size = catalog_size
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.forbidden_rate = forbidden_rate
+        self.etags = etags
+        self.epoch_day = MOCK_EPOCH_DAY
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+        self.statuses = {}
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/NORAD/elements/gp.php"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def counters(self):
+        with self.lock:
+            return self.requests, self.bytes_sent, dict(self.statuses)
+
+    def _count(self, status, size):
+        with self.lock:
+            self.requests += 1
+            self.bytes_sent += size
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def _pick_status(self):
+        with self.lock:
+            roll = self.random.random()
+        if roll < self.forbidden_rate:
+            return 403
+        if roll < self.forbidden_rate + self.error_rate:
+            return 503
+        return 200
+
+    def _body(self, query):
+        last = FIRST_CATNR + self.catalog_size
+        if "CATNR" in query:
+            catnr = int(query["CATNR"][0])
+            if not FIRST_CATNR <= catnr < last:
+                return b"No GP data found\n"
+            return mock_tle(catnr, self.epoch_day).encode("ascii")
+        if "GROUP" in query:
+            return "".join(mock_tle(c, self.epoch_day) for c in range(FIRST_CATNR, last)).encode("ascii")
+        return None
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body=b"", headers=()):
+                self.send_response(status)
+                for key, value in headers:
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+                mock._count(status, len(body))
+
+            def do_GET(self):
+                delay = mock.latency + (mock.random.uniform(0, mock.jitter) if mock.jitter else 0)
+                if delay > 0:
+                    time.sleep(delay)
+
+                status = mock._pick_status()
+                if status != 200:
+                    self._reply(status)
+                    return
+
+                body = mock._body(parse_qs(urlparse(self.path).query))
+                if body is None:
+                    self._reply(404)
+                    return
+
+                headers = []
+                if mock.etags:
+                    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                    headers.append(("ETag", etag))
+                    if self.headers.get("If-None-Match") == etag:
+                        self._reply(304, headers=headers)
+                        return
+                self._reply(200, body, headers)
+
+        return Handler
+
+
+# ==========================
+# ЗАМЕР
+# ==========================
+def percentile(values, pct):
+    """Перцентиль по ближайшему рангу (values не пустой)."""
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def stage_summary(values):
+    """p50/p95/max или None, если замеров нет (например, цикл без запросов)."""
+    if not values:
+        return None
+    return {
+        "p50": round(percentile(values, 50), 6),
+        "p95": round(percentile(values, 95), 6),
+        "max": round(max(values), 6),
+    }
+
+
+def peak_rss_mb():
+    """Пиковый RSS процесса в МБ (где доступен модуль resource) или None."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт КБ, macOS — байты
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def make_engine(mock, args, workdir, log):
+    engine = TleEngine(log=log)
+    engine.output_filename = os.path.join(workdir, "nu.txt")
+    engine.state_file = os.path.join(workdir, "state.json")
+    engine.http_cache = HttpCache(os.path.join(workdir, "cache.json"))
+    engine.archive = TleArchive(os.path.join(workdir, "archive"))
+    engine.max_parallel = args.parallel
+    engine.http_pool_size = args.parallel
+    engine.rate_limiter.rate = args.rate
+    engine.freshness_enabled = args.mode == "auto"
+    engine.bulk_catalog_urls = [] if args.no_bulk else [f"{mock.base_url}?GROUP=active&FORMAT=TLE"]
+    engine.store.load_list(
+        {"name": f"BENCH {c}", "url": f"{mock.base_url}?CATNR={c}&FORMAT=TLE"}
+        for c in range(FIRST_CATNR, FIRST_CATNR + args.sats)
+    )
+    engine.open()
+    return engine
+
+
+def run_cycles(mock, args, workdir, log, quiet=False):
+    """
+    Прогнать args.cycles циклов на новом движке с файлами в workdir.
+    Заглушка каждый раз начинает с одной и той же эпохи.
+
+    Возвращает (циклы, замеры запросов): записи о циклах с длительностью
+    загрузки и записи из CycleMetrics и RequestTiming всех запросов.
+    """
+    mock.epoch_day = MOCK_EPOCH_DAY
+    engine = make_engine(mock, args, workdir, log)
+    names = engine.store.names()
+    cycles = []
+    timings = []
+    try:
+        for cycle in range(args.cycles):
+            if args.new_epoch_every and cycle and cycle % args.new_epoch_every == 0:
+                mock.epoch_day += 0.25
+            if not args.keep_catalog:
+                # Каждый цикл идёт в сеть, а не к копии каталога в памяти
+                engine.bulk_catalog = {}
+            req_before, bytes_before, _ = mock.counters()
+            t0 = time.perf_counter()
+            result = engine.download_tles(names, is_manual=args.mode == "manual")
+            elapsed = time.perf_counter() - t0
+            req_after, bytes_after, _ = mock.counters()
+            cycles.append({
+                "cycle": cycle + 1,
+                "seconds": round(elapsed, 6),
+                "status": result.status,
+                # Получено в этом цикле: пропущенные, из кэша и с ошибкой не считаются
+                "fresh": result.metrics.satellites.get(STATUS_FRESH, 0),
+                "fetch": round(result.metrics.fetch, 6),
+                "write": round(result.metrics.write, 6),
+                "requests": req_after - req_before,
+                "bytes": bytes_after - bytes_before,
+            })
+            timings.extend(result.metrics.requests)
+            if not quiet:
+                print(
+                    f"Цикл {cycle + 1}/{args.cycles}: {elapsed:.3f} с, {result.status}, "
+                    f"получено {cycles[-1]['fresh']}, запросов {req_after - req_before}, байт {bytes_after - bytes_before}"
+                )
+    finally:
+        if engine.http_session is not None:
+            engine.http_session.close()
+    return cycles, timings
+
+
+def trace_peak_heap(mock, args, log):
+    """
+    Пик памяти Python-кучи (байты) за отдельный прогон тех же циклов.
+    tracemalloc замедляет каждое выделение памяти, поэтому в замер
+    длительности циклов он не включается.
+    """
+    tracemalloc.start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="nuBench-") as workdir:
+            run_cycles(mock, args, workdir, log, quiet=True)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(args):
+    mock = MockCelestrak(
+        args.catalog or args.sats, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, forbidden_rate=args.forbidden_rate,
+        etags=not args.no_etag, seed=args.seed,
+    ).start()
+    log = print if args.verbose else (lambda msg: None)
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="nuBench-") as workdir:
+            cycles, timings = run_cycles(mock, args, workdir, log)
+        # Счётчики заглушки и RSS — только по замеренному прогону
+        requests_total, bytes_total, statuses = mock.counters()
+        peak_rss = peak_rss_mb()
+        peak_heap = None if args.no_heap else trace_peak_heap(mock, args, log)
+    finally:
+        mock.stop()
+
+    cycle_times = [c["seconds"] for c in cycles]
+    total_time = sum(cycle_times)
+    fresh_total = sum(c["fresh"] for c in cycles)
+    return {
+        "app_version": APP_VERSION,
+        "python": sys.version.split()[0],
+        "config": {
+            "satellites": args.sats,
+            "catalog": args.catalog or args.sats,
+            "cycles": args.cycles,
+            "mode": args.mode,
+            "parallel": args.parallel,
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "error_rate": args.error_rate,
+            "forbidden_rate": args.forbidden_rate,
+            "etags": not args.no_etag,
+            "bulk": not args.no_bulk,
+            "keep_catalog": args.keep_catalog,
+        },
+        "cycles": cycles,
+        "summary": {
+            "satellites_per_second": round(fresh_total / total_time, 1) if total_time else None,
+            "fresh": fresh_total,
+            "cycle": stage_summary(cycle_times),
+            # Этапы конвейера по метрикам самих циклов: загрузка целиком и
+            # запись файлов — на цикл, тело ответа, разбор и байты — на запрос
+            "fetch": stage_summary([c["fetch"] for c in cycles]),
+            "write": stage_summary([c["write"] for c in cycles]),
+            "body": stage_summary([t.body for t in timings]),
+            "parse": stage_summary([t.parse for t in timings]),
+            "request_bytes": stage_summary([t.bytes for t in timings]),
+            "timed_requests": len(timings),
+            "requests": requests_total,
+            "bytes": bytes_total,
+            "http_statuses": {str(k): v for k, v in sorted(statuses.items())},
+            "peak_heap_mb": None if peak_heap is None else round(peak_heap / (1024 * 1024), 1),
+            "peak_rss_mb": peak_rss,
+        },
+    }
+
+
+def format_stage(stage):
+    if stage is None:
+        return "—"
+    return f"{stage['p50'] * 1000:.1f} / {stage['p95'] * 1000:.1f} мс"
+
+
+def print_summary(report):
+    s = report["summary"]
+    print()
+    print(f"Спутников/с:        {s['satellites_per_second']} (получено {s['fresh']})")
+    print(f"Цикл p50/p95:       {s['cycle']['p50']:.3f} / {s['cycle']['p95']:.3f} с")
+    print(f"Загрузка p50/p95:   {format_stage(s['fetch'])} (на цикл)")
+    print(f"Запись p50/p95:     {format_stage(s['write'])} (на цикл)")
+    print(f"Тело p50/p95:       {format_stage(s['body'])} (на запрос, {s['timed_requests']} запросов)")
+    print(f"Разбор p50/p95:     {format_stage(s['parse'])} (на запрос)")
+    print(f"Запросов / байт:    {s['requests']} / {s['bytes']}")
+    print(f"Ответы HTTP:        {s['http_statuses']}")
+    heap = "—" if s["peak_heap_mb"] is None else f"{s['peak_heap_mb']} МБ"
+    print(f"Пик памяти (heap):  {heap}, RSS: {s['peak_rss_mb']} МБ")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="nuBench", description="Замер nuUpdater на локальной заглушке Celestrak.")
+    parser.add_argument("--sats", type=int, default=500, help="спутников в списке")
+    parser.add_argument("--catalog", type=int, default=0, help="объектов в групповом каталоге (по умолчанию = --sats)")
+    parser.add_argument("--cycles", type=int, default=5, help="циклов загрузки")
+    parser.add_argument("--mode", choices=("manual", "auto"), default="manual",
+                        help="manual — запрашивать всё, auto — с планировщиком свежести")
+    parser.add_argument("--parallel", type=int, default=nuCore.DEFAULT_MAX_PARALLEL, help="потоков загрузки")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE_PER_SECOND,
+                        help="потолок частоты запросов в секунду (по умолчанию как в программе)")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="случайная добавка к задержке, до N с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 503")
+    parser.add_argument("--forbidden-rate", type=float, default=0.0, help="доля ответов 403")
+    parser.add_argument("--no-etag", action="store_true", help="заглушка без ETag (без ответов 304)")
+    parser.add_argument("--no-bulk", action="store_true", help="не использовать групповой каталог")
+    parser.add_argument("--keep-catalog", action="store_true",
+                        help="разрешить движку брать групповой каталог из памяти между циклами")
+    parser.add_argument("--new-epoch-every", type=int, default=0,
+                        help="обновлять эпоху в каталоге каждые N циклов (0 — никогда)")
+    parser.add_argument("--no-heap", action="store_true",
+                        help="не делать отдельный прогон с tracemalloc для пика памяти кучи")
+    parser.add_argument("--seed", type=int, default=1, help="зерно генератора ошибок")
+    parser.add_argument("--json", default=None, help="записать результаты в этот JSON-файл")
+    parser.add_argument("--verbose", action="store_true", help="выводить лог движка")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.sats < 1 or args.cycles < 1:
+        print("--sats и --cycles должны быть больше нуля.", file=sys.stderr)
+        return 2
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(errors="replace")
+
+    report = run_benchmark(args)
+    print_summary(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Результаты записаны в {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,3367 @@
+"""
+Ядро nuUpdater: загрузка, разбор и запись TLE без графического интерфейса.
+Используется окном (nuGui) и консольным режимом (nuUpdater.py --headless).
+
+requests импортируется лениво — только при первой загрузке, чтобы не
+замедлять запуск программы.
+"""
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+import os
+import json
+import math
+import codecs
+import csv
+import io
+import random
+from email.utils import parsedate_to_datetime
+import hashlib
+import re
+import shutil
+import struct
+import tempfile
+import zlib
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qs
+
+# ==========================
+# КОНСТАНТЫ ПРИЛОЖЕНИЯ
+# ==========================
+APP_NAME = "nuUpdater"
+APP_VERSION = "1.1"
+
+# Папка для настроек: C:\Users\ИМЯ\Documents\nuUpdater
+USER_DOCS_DIR = os.path.join(os.path.expanduser("~"), "Documents", "nuUpdater")
+os.makedirs(USER_DOCS_DIR, exist_ok=True)
+
+SETTINGS_FILE = os.path.join(USER_DOCS_DIR, "nuUpdaterSettings.json")
+HTTP_CACHE_FILE = os.path.join(USER_DOCS_DIR, "nuUpdaterCache.json")
+SAT_STATE_FILE = os.path.join(USER_DOCS_DIR, "nuUpdaterState.json")
+ARCHIVE_DIR = os.path.join(USER_DOCS_DIR, "archive")
+
+# Полный лог работы: файл с ротацией (текущий + LOG_FILE_BACKUPS старых)
+LOG_FILE = os.path.join(USER_DOCS_DIR, "nuUpdater.log")
+LOG_FILE_MAX_BYTES = 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+# Сколько запросов к серверу может выполняться одновременно
+DEFAULT_MAX_PARALLEL = 8
+MAX_PARALLEL_LIMIT = 32
+
+# Пул HTTP-соединений (keep-alive) к серверу
+DEFAULT_HTTP_POOL_SIZE = 8
+
+# Групповые запросы: если CATNR-спутников много, дешевле один раз скачать
+# групповой каталог и разобрать его по номерам, чем делать запрос на каждый
+DEFAULT_BULK_CATALOG_URLS = [
+    "https://celestrak.org/NORAD/elements/gp.php?GROUP=active&FORMAT=TLE",
+]
+DEFAULT_BULK_THRESHOLD = 20
+BULK_CATALOG_TTL = 30 * 60  # сколько секунд каталог считается свежим
+
+# Планировщик свежести: спутник запрашивается, только когда по его эпохе
+# можно ожидать новые элементы (все значения в секундах)
+DEFAULT_EPOCH_GAP = 12 * 60 * 60       # начальная оценка периода обновления
+MIN_EPOCH_GAP = 60 * 60
+MAX_EPOCH_GAP = 3 * 24 * 60 * 60
+MIN_RECHECK = 15 * 60                  # не чаще, чем раз в 15 минут на объект
+DEFAULT_FRESHNESS_MAX_AGE = 6 * 60 * 60  # жёсткий предел: проверять хотя бы раз в 6 часов
+
+# Если спутник не удалось получить, в файл идёт последняя удачная копия,
+# но не старше этого срока
+DEFAULT_MAX_STALENESS = 72 * 60 * 60
+
+# Ограничение частоты запросов к каждому серверу (token bucket) и пауза
+# с экспоненциальным ростом при 403/429 или серии таймаутов. Частота
+# адаптивная: сначала — потолок DEFAULT_RATE_PER_SECOND (параллельной
+# загрузке он не мешает), после ограничения сервером она делится пополам,
+# а с каждым удачным ответом понемногу возвращается к потолку
+DEFAULT_RATE_PER_SECOND = 50.0
+DEFAULT_RATE_BURST = 0              # 0 — по числу параллельных запросов
+RATE_MIN_FACTOR = 1 / 16            # ниже потолка / 16 частота не опускается
+RATE_RECOVERY_STEP = 0.05           # прибавка к доле потолка за удачный ответ
+BACKOFF_BASE = 60                   # первая пауза, сек
+BACKOFF_MAX = 2 * 60 * 60           # потолок паузы (прежний фиксированный кулдаун)
+HOST_TIMEOUT_THRESHOLD = 3          # столько таймаутов подряд — проблема сервера, а не URL
+
+# ==========================
+# СПУТНИКИ ПО УМОЛЧАНИЮ
+# ==========================
+DEFAULT_SATELLITES = [
+    {
+        "name": "NOAA 20",
+        "url": "https://celestrak.org/NORAD/elements/gp.php?CATNR=43013&FORMAT=TLE",
+    },
+    {
+        "name": "SUOMI NPP",
+        "url": "https://celestrak.org/NORAD/elements/gp.php?CATNR=37849&FORMAT=TLE",
+    },
+    {
+        "name": "AQUA",
+        "url": "https://celestrak.org/NORAD/elements/gp.php?CATNR=27424&FORMAT=TLE",
+    },
+]
+
+
+# ==========================
+# РАЗБОР URL И TLE
+# ==========================
+def parse_catnr_url(url):
+    """
+    Если url — обычный запрос Celestrak вида gp.php?CATNR=...&FORMAT=TLE,
+    вернуть номер по каталогу (строкой без ведущих нулей), иначе None.
+    """
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return None
+    if not parsed.path.endswith("gp.php"):
+        return None
+
+    query = parse_qs(parsed.query)
+    if set(query) - {"CATNR", "FORMAT"}:
+        return None
+    if query.get("FORMAT", ["TLE"])[0].upper() != "TLE":
+        return None
+
+    catnr = query.get("CATNR", [""])[0].strip()
+    if not catnr.isdigit():
+        return None
+    return str(int(catnr))
+
+
+def parse_tle_epoch(line1):
+    """Эпоха из 1-й строки TLE (колонки 19-32, YYDDD.DDDDDDDD) как Unix-время или None."""
+    field = line1[18:32].strip()
+    try:
+        yy = int(field[:2])
+        day_of_year = float(field[2:])
+    except ValueError:
+        return None
+    year = 2000 + yy if yy < 57 else 1900 + yy
+    start = datetime(year, 1, 1, tzinfo=timezone.utc).timestamp()
+    return start + (day_of_year - 1) * 86400
+
+
+def block_epoch(block):
+    """Эпоха TLE-блока (по первой строке, начинающейся с "1 ") или None."""
+    for line in block.splitlines():
+        if line.startswith("1 "):
+            return parse_tle_epoch(line)
+    return None
+
+
+def format_duration(seconds):
+    """Секунды в строку ЧЧ:ММ:СС или ММ:СС."""
+    s = int(seconds)
+    h = s // 3600
+    s %= 3600
+    m = s // 60
+    s %= 60
+    if h > 0:
+        return f"{h:02d}:{m:02d}:{s:02d}"
+    return f"{m:02d}:{s:02d}"
+
+
+def default_group(name):
+    """Группа спутника по умолчанию — первое слово названия ("STARLINK-1007" → "STARLINK")."""
+    match = re.match(r"[^\W\d_]+", name.strip())
+    return match.group(0).upper() if match else "ПРОЧИЕ"
+
+
+def block_catnr(block):
+    """Номер по каталогу из TLE-блока (по первой строке "1 ...") или None."""
+    for line in block.splitlines():
+        if line.startswith("1 ") and len(line) > 7:
+            return catnr_key(line[2:7])
+    return None
+
+
+def is_http_403(err):
+    """Проверить, что исключение requests вызвано ответом 403."""
+    resp = getattr(err, "response", None)
+    return resp is not None and resp.status_code == 403
+
+
+def same_host(url_a, url_b):
+    """Проверить, что два URL указывают на один и тот же сервер."""
+    a = urlparse(url_a)
+    b = urlparse(url_b)
+    return (a.scheme, a.netloc.lower()) == (b.scheme, b.netloc.lower())
+
+
+def catnr_key(catnr):
+    """Номер по каталогу в виде ключа: без ведущих нулей (или как есть для Alpha-5)."""
+    catnr = str(catnr).strip()
+    return str(int(catnr)) if catnr.isdigit() else catnr.upper()
+
+
+# ==========================
+# ПОТОКОВЫЙ РАЗБОР И ПРОВЕРКА TLE
+# ==========================
+TLE_LINE_LENGTH = 69
+STREAM_CHUNK_SIZE = 64 * 1024
+
+TleRecord = namedtuple("TleRecord", "name line1 line2 catnr")
+
+
+def tle_checksum(line):
+    """Контрольная сумма строки TLE по модулю 10 (цифры + 1 за каждый минус)."""
+    total = 0
+    for ch in line[:TLE_LINE_LENGTH - 1]:
+        if ch.isdigit():
+            total += int(ch)
+        elif ch == "-":
+            total += 1
+    return total % 10
+
+
+def validate_tle(line1, line2):
+    """Проверить пару строк TLE. Возвращает причину отказа или None."""
+    if len(line1) != TLE_LINE_LENGTH or len(line2) != TLE_LINE_LENGTH:
+        return "неверная длина строки"
+    if line1[0] != "1" or line2[0] != "2":
+        return "неверный номер строки"
+    if not line1[-1].isdigit() or tle_checksum(line1) != int(line1[-1]):
+        return "контрольная сумма строки 1"
+    if not line2[-1].isdigit() or tle_checksum(line2) != int(line2[-1]):
+        return "контрольная сумма строки 2"
+    if line1[2:7] != line2[2:7]:
+        return "разные номера по каталогу"
+    return None
+
+
+def record_block(record):
+    """TLE-запись в виде блока текста для файла (2 или 3 строки)."""
+    if record.name:
+        return f"{record.name}\n{record.line1}\n{record.line2}"
+    return f"{record.line1}\n{record.line2}"
+
+
+def iter_text_lines(chunks):
+    """
+    Разбить поток кусков текста (str или bytes в UTF-8) на очищенные
+    непустые строки, не собирая весь ответ в одну строку.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    tail = ""
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        if not chunk:
+            continue
+        parts = (tail + chunk).splitlines()
+        # Последняя часть может быть недочитанной строкой
+        if chunk[-1] not in "\r\n":
+            tail = parts.pop() if parts else ""
+        else:
+            tail = ""
+        for part in parts:
+            part = part.strip()
+            if part:
+                yield part
+    tail = (tail + decoder.decode(b"", final=True)).strip()
+    if tail:
+        yield tail
+
+
+class TleStreamParser:
+    """
+    Потоковый разбор ответа в записи TLE (имя + две строки) с проверкой
+    контрольных сумм, номеров строк и совпадения номеров по каталогу.
+    Некорректные записи (HTML-страницы ошибок, обрезанные ответы и т.п.)
+    отбрасываются и считаются в rejected/reasons.
+    """
+
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+        self.reasons = {}
+
+    def _reject(self, reason):
+        self.rejected += 1
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def records(self, chunks):
+        """Генератор TleRecord по потоку кусков текста."""
+        name = ""
+        line1 = None
+        for line in iter_text_lines(chunks):
+            if line.startswith("1 ") and len(line) > 2:
+                if line1 is not None:
+                    self._reject("строка 1 без строки 2")
+                line1 = line
+            elif line.startswith("2 ") and len(line) > 2:
+                if line1 is None:
+                    self._reject("строка 2 без строки 1")
+                    name = ""
+                    continue
+                reason = validate_tle(line1, line)
+                if reason:
+                    self._reject(reason)
+                else:
+                    self.accepted += 1
+                    yield TleRecord(name, line1, line, catnr_key(line1[2:7]))
+                name = ""
+                line1 = None
+            else:
+                if line1 is not None:
+                    self._reject("строка 1 без строки 2")
+                    line1 = None
+                # Формат 3LE: строка имени начинается с "0 "
+                name = line[2:].strip() if line.startswith("0 ") else line
+        if line1 is not None:
+            self._reject("обрезанная запись")
+
+    def summary(self):
+        """Строка с причинами отказов для лога."""
+        return ", ".join(f"{reason} — {count}" for reason, count in self.reasons.items())
+
+
+# ==========================
+# ФАЙЛ ЛОГА
+# ==========================
+def open_log_file(path=LOG_FILE):
+    """
+    Логгер, пишущий строки в файл с ротацией по размеру. Потокобезопасен.
+    Возвращает None, если файл открыть не удалось (лог тогда только в окне).
+    """
+    # logging нужен только для файла лога — импортируем по месту
+    import logging
+    from logging.handlers import RotatingFileHandler
+
+    try:
+        handler = RotatingFileHandler(
+            path, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS,
+            encoding="utf-8", delay=True
+        )
+    except OSError:
+        return None
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s", "%Y-%m-%d %H:%M:%S"))
+
+    logger = logging.getLogger(APP_NAME)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    for old in list(logger.handlers):
+        logger.removeHandler(old)
+        old.close()
+    logger.addHandler(handler)
+    return logger
+
+
+# ==========================
+# АТОМАРНАЯ ЗАПИСЬ ФАЙЛОВ
+# ==========================
+def atomic_write(path, data):
+    """
+    Записать байты data в path атомарно: временный файл в той же папке,
+    fsync и переименование поверх старого. Читатель видит либо старый,
+    либо новый файл целиком.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".nuUpdater-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        else:
+            # mkstemp создаёт файл с правами 0600 — выставляем обычные
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_if_changed(path, text):
+    """
+    Атомарно записать текст в path, только если содержимое изменилось
+    (сравнение по SHA-256). Неизменённый файл не трогается и сохраняет mtime.
+
+    Возвращает True, если файл был перезаписан.
+    """
+    # Как и при записи в текстовом режиме — переводы строк платформы
+    data = text.replace("\n", os.linesep).encode("utf-8")
+    try:
+        with open(path, "rb") as f:
+            old_hash = hashlib.sha256(f.read()).digest()
+    except OSError:
+        old_hash = None
+
+    if old_hash == hashlib.sha256(data).digest():
+        return False
+    atomic_write(path, data)
+    return True
+
+
+# ==========================
+# ДИСКОВЫЙ КЭШ HTTP-ОТВЕТОВ
+# ==========================
+class HttpCache:
+    """
+    Кэш тел ответов по URL вместе с валидаторами (ETag, Last-Modified).
+    Позволяет отправлять условные запросы и брать тело из кэша при 304.
+    Потокобезопасен: используется из пула загрузки.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict):
+            self.entries = {
+                url: entry for url, entry in data.items()
+                if isinstance(entry, dict) and isinstance(entry.get("body"), str)
+            }
+
+    def conditional_headers(self, url):
+        """Заголовки If-None-Match / If-Modified-Since для url (если есть в кэше)."""
+        with self.lock:
+            entry = self.entries.get(url)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def not_modified(self, url):
+        """
+        Ответ 304: вернуть тело из кэша. Запись на диске при этом не
+        меняется, поэтому цикл из одних 304 не перезаписывает файл кэша
+        (с многомегабайтным телом группового каталога).
+        """
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return None
+            self.hits += 1
+            return entry["body"]
+
+    def store(self, url, headers, body):
+        """Сохранить тело ответа, если сервер прислал валидаторы."""
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        with self.lock:
+            self.misses += 1
+            if not etag and not last_modified:
+                if self.entries.pop(url, None) is not None:
+                    self.dirty = True
+                return
+            old = self.entries.get(url)
+            if old and (old.get("etag"), old.get("last_modified"), old.get("body")) == (etag, last_modified, body):
+                return      # тот же ответ — на диске ничего не меняется
+            self.entries[url] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched_at": time.time(),
+                "body": body,
+            }
+            self.dirty = True
+
+    def stats(self):
+        """Возвращает (ответов 304, полных загрузок) с момента запуска."""
+        with self.lock:
+            return self.hits, self.misses
+
+    def save(self):
+        """Записать кэш на диск (через временный файл), если он менялся."""
+        with self.lock:
+            if not self.dirty:
+                return
+            data = json.dumps(self.entries, ensure_ascii=False)
+            self.dirty = False
+        try:
+            atomic_write(self.path, data.encode("utf-8"))
+        except OSError:
+            # Изменения не записаны — попробуем снова при следующем сохранении
+            with self.lock:
+                self.dirty = True
+            raise
+
+
+# ==========================
+# ОБЩИЙ КЭШ НЕСКОЛЬКИХ КОПИЙ ПРОГРАММЫ
+# ==========================
+# Сколько запись общего кэша считается свежей (секунд), если не задано
+# в настройках: в это время ни одна копия не ходит на сервер по этому URL
+SHARED_CACHE_MAX_AGE = 30 * 60
+# Сколько ждать, пока другая копия загрузит тот же URL
+SHARED_CACHE_LOCK_WAIT = 90
+# Блокировка старше этого брошена упавшей копией и снимается; пока
+# загрузка идёт, владелец обновляет время файла раз в SHARED_CACHE_HEARTBEAT
+SHARED_CACHE_LOCK_STALE = 300
+SHARED_CACHE_HEARTBEAT = 30
+SHARED_CACHE_POLL = 0.25
+
+
+class SharedCache:
+    """
+    Общий для нескольких копий nuUpdater кэш ответов в папке (локальной
+    или сетевой). На каждый URL — файл <sha1>.json с проверенными TLE и
+    временем загрузки. Пока запись свежая, сервер не запрашивается.
+
+    Загрузку одного URL в каждый момент ведёт только одна копия (и один
+    поток): владелец создаёт <sha1>.lock с O_EXCL, остальные ждут и берут
+    уже записанный результат. Такая блокировка работает и на Windows, и
+    на сетевых папках, где fcntl/msvcrt-блокировки ненадёжны.
+    """
+
+    def __init__(self, directory, max_age=SHARED_CACHE_MAX_AGE):
+        self.directory = directory
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.fetches = 0
+        self.waits = 0
+        self.heartbeats = {}    # {url: threading.Event остановки обновления блокировки}
+        self.available = True   # False после ошибки доступа к папке, до следующего успеха
+
+    def _path(self, url, ext):
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest() + ext)
+
+    def read(self, url):
+        """(тело, возраст в секундах) записи для url или (None, None)."""
+        try:
+            with open(self._path(url, ".json"), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None, None
+        if not isinstance(entry, dict) or entry.get("url") != url or not isinstance(entry.get("body"), str):
+            return None, None
+        fetched_at = entry.get("fetched_at")
+        if not isinstance(fetched_at, (int, float)):
+            return None, None
+        return entry["body"], max(0.0, time.time() - fetched_at)
+
+    def fresh(self, url):
+        """Тело свежей записи для url или None."""
+        body, age = self.read(url)
+        if body is None or age >= self.max_age:
+            return None
+        with self.lock:
+            self.hits += 1
+        return body
+
+    def store(self, url, body):
+        data = json.dumps({"url": url, "fetched_at": time.time(), "body": body}, ensure_ascii=False)
+        atomic_write(self._path(url, ".json"), data.encode("utf-8"))
+        with self.lock:
+            self.fetches += 1
+
+    def acquire(self, url, wait=SHARED_CACHE_LOCK_WAIT):
+        """
+        Стать единственным загрузчиком url. Возвращает True, если блокировка
+        получена, False — если за wait секунд её не отпустили.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(url, ".lock")
+        deadline = time.monotonic() + wait
+        waited = False
+        while True:
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(path) > SHARED_CACHE_LOCK_STALE:
+                        os.remove(path)
+                        continue
+                except OSError:
+                    continue    # блокировку только что сняли
+                if time.monotonic() >= deadline:
+                    return False
+                if not waited:
+                    waited = True
+                    with self.lock:
+                        self.waits += 1
+                time.sleep(SHARED_CACHE_POLL)
+                continue
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(f"{os.getpid()}\n")
+            except OSError:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                raise
+            self._start_heartbeat(url, path)
+            return True
+
+    def _start_heartbeat(self, url, path):
+        """Обновлять время файла блокировки, пока идёт загрузка, чтобы долгую
+        загрузку другие копии не приняли за брошенную."""
+        stop = threading.Event()
+        with self.lock:
+            self.heartbeats[url] = stop
+
+        def beat():
+            while not stop.wait(SHARED_CACHE_HEARTBEAT):
+                try:
+                    os.utime(path)
+                except OSError:
+                    return
+
+        threading.Thread(target=beat, name="shared-cache-lock", daemon=True).start()
+
+    def release(self, url):
+        with self.lock:
+            stop = self.heartbeats.pop(url, None)
+        if stop is not None:
+            stop.set()
+        try:
+            os.remove(self._path(url, ".lock"))
+        except OSError:
+            pass
+
+    def set_available(self, available):
+        """Отметить доступность папки; True, если она изменилась (об этом стоит сообщить)."""
+        with self.lock:
+            changed = self.available != available
+            self.available = available
+            return changed
+
+    def stats(self):
+        """Возвращает (взято из общего кэша, загружено с сервера, ожиданий чужой загрузки)."""
+        with self.lock:
+            return self.hits, self.fetches, self.waits
+
+
+# ==========================
+# АРХИВ TLE
+# ==========================
+# Записей в одном сжатом куске: при поиске распаковывается только он
+ARCHIVE_CHUNK_RECORDS = 256
+# Сколько распакованных кусков держать в памяти для повторных запросов
+ARCHIVE_CHUNK_CACHE = 8
+
+_ARCHIVE_MAGIC = b"NUA1"
+# Заголовок куска в файле данных: метка, длина сжатых данных, число записей
+_ARCHIVE_CHUNK = struct.Struct("<4sII")
+# Запись индекса: номер по каталогу (ASCII, 5 байт), эпоха, смещение куска, номер в куске
+_ARCHIVE_ENTRY = struct.Struct("<5sdQH")
+# Заголовок записи журнала: длина блока в байтах, CRC32 блока
+_ARCHIVE_TAIL_RECORD = struct.Struct("<II")
+_ARCHIVE_SEPARATOR = "\x1e"
+# Смещение в индексе в памяти для записей, которые ещё в журнале
+_ARCHIVE_IN_TAIL = 2 ** 64 - 1
+
+
+class TleArchive:
+    """
+    История TLE: каждый новый набор элементов спутника (по эпохе) один раз
+    дописывается в архив и больше не меняется.
+
+        tle-archive.dat  — куски по ARCHIVE_CHUNK_RECORDS записей, сжатые zlib;
+        tle-archive.idx  — записи фиксированной длины (номер, эпоха, кусок, позиция);
+        tle-archive.tail — журнал несжатых записей, которые ещё не набрали кусок.
+
+    Все три файла только дописываются, записанные байты не перезаписываются.
+    Новые записи сначала попадают в журнал (с fsync); когда в нём набирается
+    ARCHIVE_CHUNK_RECORDS записей, они сжимаются в кусок в конце файла
+    данных, затем дописывается индекс, и только после этого журнал
+    заменяется остатком. Сбой на любом шаге теряет лишь недописанную
+    запись: недописанный кусок без индекса затирается следующим куском, а
+    записи журнала, уже попавшие в индекс, при загрузке отбрасываются.
+
+    Индекс читается в память при первом обращении — по номеру хранятся
+    отсортированные массивы эпох, и «TLE на момент T» находится бисекцией
+    с распаковкой одного куска. Без файла индекса он восстанавливается
+    по файлу данных.
+    """
+
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        self.data_path = os.path.join(directory, "tle-archive.dat")
+        self.index_path = os.path.join(directory, "tle-archive.idx")
+        self.tail_path = os.path.join(directory, "tle-archive.tail")
+        self.lock = threading.Lock()
+        self.index = None       # {catnr: (эпохи array("d"), смещения array("Q"), позиции array("H"))}
+        self.data_end = 0       # конец последнего куска, на который ссылается индекс
+        self.index_end = 0      # конец последней целой записи индекса
+        self.tail_end = 0       # конец последней целой записи журнала
+        self.tail = []          # [(номер, эпоха, блок)] — записи журнала
+        self.chunks = {}        # {смещение: [блоки]} — недавно распакованные куски
+
+    # ---- индекс ----
+    def _insert(self, catnr, epoch, offset, pos):
+        """Добавить запись в индекс в памяти; False, если такая эпоха уже есть."""
+        entry = self.index.get(catnr)
+        if entry is None:
+            entry = self.index[catnr] = (array("d"), array("Q"), array("H"))
+        epochs, offsets, positions = entry
+        i = bisect_right(epochs, epoch)
+        if i and epochs[i - 1] == epoch:
+            return False
+        epochs.insert(i, epoch)
+        offsets.insert(i, offset)
+        positions.insert(i, pos)
+        return True
+
+    def _find(self, catnr, epoch):
+        """Позиция эпохи в массивах индекса спутника или None."""
+        entry = self.index.get(catnr)
+        if entry is None:
+            return None
+        i = bisect_right(entry[0], epoch)
+        return i - 1 if i and entry[0][i - 1] == epoch else None
+
+    def _read_chunk(self, f, offset, data_size):
+        """Блоки целого куска по смещению или None, если кусок повреждён."""
+        f.seek(offset)
+        header = f.read(_ARCHIVE_CHUNK.size)
+        if len(header) < _ARCHIVE_CHUNK.size:
+            return None
+        magic, length, count = _ARCHIVE_CHUNK.unpack(header)
+        if magic != _ARCHIVE_MAGIC or offset + _ARCHIVE_CHUNK.size + length > data_size:
+            return None
+        try:
+            blocks = zlib.decompress(f.read(length)).decode("utf-8").split(_ARCHIVE_SEPARATOR)
+        except (zlib.error, UnicodeDecodeError):
+            return None
+        return blocks if len(blocks) == count else None
+
+    def _load(self):
+        """Прочитать индекс и журнал (под self.lock), при необходимости восстановить индекс."""
+        if self.index is not None:
+            return
+        self.index = {}
+        try:
+            data_size = os.path.getsize(self.data_path)
+        except OSError:
+            data_size = 0
+        try:
+            with open(self.index_path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            raw = None
+
+        if raw is None:
+            if data_size:
+                self._rebuild(data_size)
+        elif data_size:
+            self._load_index(raw, data_size)
+        self._load_tail()
+
+    def _load_index(self, raw, data_size):
+        # Недописанная последняя запись (сбой при записи) отбрасывается
+        self.index_end = len(raw) - len(raw) % _ARCHIVE_ENTRY.size
+        last_offset = None
+        for catnr, epoch, offset, pos in _ARCHIVE_ENTRY.iter_unpack(memoryview(raw)[:self.index_end]):
+            self._insert(catnr.rstrip(b"\0").decode("ascii"), epoch, offset, pos)
+            if last_offset is None or offset > last_offset:
+                last_offset = offset
+        if last_offset is None:
+            return
+
+        # Куски пишутся до индекса, поэтому последний кусок из индекса цел;
+        # если файл данных всё же испорчен, индекс строится заново по целым кускам
+        with open(self.data_path, "rb") as f:
+            blocks = self._read_chunk(f, last_offset, data_size)
+            end = f.tell()
+        if blocks is None:
+            self.index = {}
+            self._rebuild(data_size)
+            return
+        self.data_end = end
+
+    def _rebuild(self, data_size):
+        """Восстановить индекс по файлу данных (до первого повреждённого куска)."""
+        entries = bytearray()
+        offset = 0
+        with open(self.data_path, "rb") as f:
+            while offset < data_size:
+                blocks = self._read_chunk(f, offset, data_size)
+                if blocks is None:
+                    break
+                for pos, block in enumerate(blocks):
+                    catnr, epoch = block_catnr(block), block_epoch(block)
+                    if catnr and epoch is not None and self._insert(catnr, epoch, offset, pos):
+                        entries += _ARCHIVE_ENTRY.pack(catnr.encode("ascii"), epoch, offset, pos)
+                offset = f.tell()
+        self.data_end = offset
+        atomic_write(self.index_path, bytes(entries))
+        self.index_end = len(entries)
+
+    def _load_tail(self):
+        """Прочитать журнал до первой недописанной записи."""
+        try:
+            with open(self.tail_path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return
+        records = []
+        sealed = False
+        pos = 0
+        while pos + _ARCHIVE_TAIL_RECORD.size <= len(raw):
+            length, crc = _ARCHIVE_TAIL_RECORD.unpack_from(raw, pos)
+            start = pos + _ARCHIVE_TAIL_RECORD.size
+            data = raw[start:start + length]
+            if len(data) < length or zlib.crc32(data) != crc:
+                break
+            pos = start + length
+            block = data.decode("utf-8", errors="replace")
+            catnr, epoch = block_catnr(block), block_epoch(block)
+            if not catnr or epoch is None:
+                continue
+            # Запись уже в куске: сбой случился после индекса, до замены журнала
+            if self._insert(catnr, epoch, _ARCHIVE_IN_TAIL, len(records)):
+                records.append((catnr, epoch, block))
+            else:
+                sealed = True
+        self.tail = records
+        self.tail_end = pos
+        if sealed:
+            self._replace_tail()
+
+    # ---- запись ----
+    def _replace_tail(self):
+        """Заменить журнал записями self.tail (атомарно, через новый файл)."""
+        if self.tail:
+            data = b"".join(self._tail_record(block) for _, _, block in self.tail)
+            atomic_write(self.tail_path, data)
+            self.tail_end = len(data)
+        else:
+            try:
+                os.remove(self.tail_path)
+            except FileNotFoundError:
+                pass
+            self.tail_end = 0
+
+    @staticmethod
+    def _tail_record(block):
+        data = block.encode("utf-8")
+        return _ARCHIVE_TAIL_RECORD.pack(len(data), zlib.crc32(data)) + data
+
+    def _seal(self):
+        """Сжать полные ARCHIVE_CHUNK_RECORDS записей журнала в куски в конце файла данных."""
+        full = len(self.tail) - len(self.tail) % ARCHIVE_CHUNK_RECORDS
+        entries = bytearray()
+        moved = []
+        mode = "r+b" if os.path.exists(self.data_path) else "w+b"
+        with open(self.data_path, mode) as f:
+            # Недописанный кусок после сбоя (без записей индекса) затирается
+            f.truncate(self.data_end)
+            f.seek(self.data_end)
+            for start in range(0, full, ARCHIVE_CHUNK_RECORDS):
+                offset = f.tell()
+                part = self.tail[start:start + ARCHIVE_CHUNK_RECORDS]
+                payload = zlib.compress(_ARCHIVE_SEPARATOR.join(b for _, _, b in part).encode("utf-8"), 9)
+                f.write(_ARCHIVE_CHUNK.pack(_ARCHIVE_MAGIC, len(payload), len(part)))
+                f.write(payload)
+                for pos, (catnr, epoch, _) in enumerate(part):
+                    entries += _ARCHIVE_ENTRY.pack(catnr.encode("ascii"), epoch, offset, pos)
+                    moved.append((catnr, epoch, offset, pos))
+            f.flush()
+            os.fsync(f.fileno())
+            data_end = f.tell()
+
+        with open(self.index_path, "ab") as f:
+            if f.tell() != self.index_end:
+                f.truncate(self.index_end)
+                f.seek(self.index_end)
+            f.write(entries)
+            f.flush()
+            os.fsync(f.fileno())
+            self.index_end = f.tell()
+        self.data_end = data_end
+
+        for catnr, epoch, offset, pos in moved:
+            entry = self.index[catnr]
+            i = self._find(catnr, epoch)
+            entry[1][i] = offset
+            entry[2][i] = pos
+        self.tail = self.tail[full:]
+        for pos, (catnr, epoch, _) in enumerate(self.tail):
+            self.index[catnr][2][self._find(catnr, epoch)] = pos
+        self._replace_tail()
+
+    def append(self, blocks):
+        """
+        Дописать в архив TLE-блоки, которых в нём ещё нет (по номеру и
+        эпохе). Возвращает число добавленных записей; без новых записей
+        файлы не открываются.
+
+        Записи дописываются в журнал; частые циклы с несколькими новыми
+        TLE не плодят мелких кусков — кусок сжимается, когда журнал
+        набирает ARCHIVE_CHUNK_RECORDS записей.
+        """
+        with self.lock:
+            self._load()
+            new = []
+            seen = set()
+            for block in blocks:
+                for record in TleStreamParser().records([block]):
+                    epoch = parse_tle_epoch(record.line1)
+                    key = (record.catnr, epoch)
+                    if epoch is None or key in seen or self._find(*key) is not None:
+                        continue
+                    seen.add(key)
+                    new.append((record.catnr, epoch, record_block(record)))
+            if not new:
+                return 0
+
+            os.makedirs(self.directory, exist_ok=True)
+            mode = "r+b" if os.path.exists(self.tail_path) else "w+b"
+            with open(self.tail_path, mode) as f:
+                # Недописанная запись после сбоя затирается
+                f.truncate(self.tail_end)
+                f.seek(self.tail_end)
+                f.write(b"".join(self._tail_record(block) for _, _, block in new))
+                f.flush()
+                os.fsync(f.fileno())
+                self.tail_end = f.tell()
+            for catnr, epoch, block in new:
+                self._insert(catnr, epoch, _ARCHIVE_IN_TAIL, len(self.tail))
+                self.tail.append((catnr, epoch, block))
+
+            if len(self.tail) >= ARCHIVE_CHUNK_RECORDS:
+                self._seal()
+            return len(new)
+
+    # ---- запросы ----
+    def _read_block(self, offset, pos):
+        if offset == _ARCHIVE_IN_TAIL:
+            return self.tail[pos][2]
+        blocks = self.chunks.pop(offset, None)
+        if blocks is None:
+            with open(self.data_path, "rb") as f:
+                f.seek(offset)
+                _, length, _ = _ARCHIVE_CHUNK.unpack(f.read(_ARCHIVE_CHUNK.size))
+                blocks = zlib.decompress(f.read(length)).decode("utf-8").split(_ARCHIVE_SEPARATOR)
+            while len(self.chunks) >= ARCHIVE_CHUNK_CACHE:
+                self.chunks.pop(next(iter(self.chunks)))
+        self.chunks[offset] = blocks
+        return blocks[pos]
+
+    def lookup(self, catnr, at):
+        """
+        TLE, действовавший на момент at (Unix-время): последний с эпохой
+        не позже at. Возвращает (эпоха, блок) или None.
+        """
+        with self.lock:
+            self._load()
+            entry = self.index.get(catnr_key(catnr))
+            if entry is None:
+                return None
+            i = bisect_right(entry[0], at)
+            if not i:
+                return None
+            return entry[0][i - 1], self._read_block(entry[1][i - 1], entry[2][i - 1])
+
+    def history(self, catnr, start=None, end=None):
+        """Все TLE спутника с эпохой в [start, end] как [(эпоха, блок)] по возрастанию."""
+        with self.lock:
+            self._load()
+            entry = self.index.get(catnr_key(catnr))
+            if entry is None:
+                return []
+            epochs, offsets, positions = entry
+            lo = 0 if start is None else bisect_left(epochs, start)
+            hi = len(epochs) if end is None else bisect_right(epochs, end)
+            return [(epochs[i], self._read_block(offsets[i], positions[i])) for i in range(lo, hi)]
+
+    def stats(self):
+        """Возвращает (спутников, записей) в архиве."""
+        with self.lock:
+            self._load()
+            return len(self.index), sum(len(entry[0]) for entry in self.index.values())
+
+
+# ==========================
+# ХРАНИЛИЩЕ СПУТНИКОВ
+# ==========================
+# Значения SatRecord.status по итогам последнего цикла
+STATUS_NEW = "new"          # ещё не загружался
+STATUS_FRESH = "fresh"      # получен в этом цикле
+STATUS_SKIPPED = "skipped"  # пропущен планировщиком, данные свежие
+STATUS_CACHED = "cached"    # ошибка загрузки, взята последняя удачная копия
+STATUS_FAILED = "failed"    # ошибка загрузки, пригодной копии нет
+
+# Поля состояния, которые переживают перезапуск (nuUpdaterState.json)
+_STATE_FIELDS = ("block", "epoch", "checked_at", "gap", "recheck")
+
+
+class SatRecord:
+    """Запись о спутнике: настройки, последний TLE и состояние загрузки."""
+
+    __slots__ = ("name", "url", "catnr", "group", "block", "epoch", "checked_at", "gap", "recheck", "status")
+
+    def __init__(self, name, url, group=None):
+        self.name = name
+        self.url = url
+        self.catnr = parse_catnr_url(url)
+        # Явно заданная группа (например, при импорте группы Celestrak) или None
+        self.group = group
+        self.reset_state()
+
+    def group_name(self):
+        return self.group or default_group(self.name)
+
+    def reset_state(self):
+        self.block = None
+        self.epoch = None
+        self.checked_at = 0.0
+        self.gap = DEFAULT_EPOCH_GAP
+        self.recheck = MIN_RECHECK
+        self.status = STATUS_NEW
+
+
+class SatelliteStore:
+    """
+    Список спутников в порядке пользователя с индексами по названию и
+    номеру по каталогу (поиск за O(1)). Общий для загрузчика, окна
+    управления спутниками и записи файла. Потокобезопасен.
+    """
+
+    def __init__(self, items=()):
+        self.records = []
+        self.by_name = {}
+        self.by_catnr = {}
+        self.lock = threading.RLock()
+        self.saved_state = {}
+        self.load_list(items)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        with self.lock:
+            return iter(list(self.records))
+
+    def _reindex(self):
+        self.by_name = {rec.name: rec for rec in self.records}
+        self.by_catnr = {rec.catnr: rec for rec in self.records if rec.catnr}
+
+    def _apply_saved_state(self, rec):
+        entry = self.saved_state.get(rec.name)
+        if not entry or entry.get("url") != rec.url or not isinstance(entry.get("block"), str):
+            return
+        for field in _STATE_FIELDS:
+            if field in entry:
+                setattr(rec, field, entry[field])
+        if rec.catnr is None:
+            rec.catnr = block_catnr(rec.block)
+
+    # ---- список спутников (настройки) ----
+    def load_list(self, items):
+        """Заменить список спутников из списка словарей {"name", "url"}."""
+        with self.lock:
+            self.records = []
+            seen = set()
+            for item in items:
+                name = item.get("name")
+                url = item.get("url")
+                if not isinstance(name, str) or not isinstance(url, str) or name in seen:
+                    continue
+                seen.add(name)
+                group = item.get("group")
+                rec = SatRecord(name, url, group if isinstance(group, str) and group else None)
+                self._apply_saved_state(rec)
+                self.records.append(rec)
+            self._reindex()
+
+    def to_list(self):
+        """Список спутников для файла настроек."""
+        with self.lock:
+            items = []
+            for rec in self.records:
+                item = {"name": rec.name, "url": rec.url}
+                if rec.group:
+                    item["group"] = rec.group
+                items.append(item)
+            return items
+
+    def names(self):
+        with self.lock:
+            return [rec.name for rec in self.records]
+
+    def groups(self):
+        """Отсортированный список групп спутников."""
+        with self.lock:
+            return sorted({rec.group_name() for rec in self.records})
+
+    def get(self, name):
+        return self.by_name.get(name)
+
+    def get_by_catnr(self, catnr):
+        return self.by_catnr.get(catnr_key(catnr))
+
+    def add(self, name, url, group=None):
+        """Добавить спутник в конец списка. ValueError, если название занято."""
+        with self.lock:
+            if name in self.by_name:
+                raise ValueError(f"Спутник «{name}» уже есть в списке.")
+            rec = SatRecord(name, url, group)
+            self.records.append(rec)
+            self.by_name[name] = rec
+            if rec.catnr:
+                self.by_catnr[rec.catnr] = rec
+            return rec
+
+    def add_many(self, entries, group=None):
+        """
+        Добавить пачку спутников из списка (name, catnr) с CATNR-ссылками
+        Celestrak. Повторы по номеру по каталогу (в пачке и в списке)
+        пропускаются; при совпадении названия к нему добавляется номер.
+
+        Возвращает:
+            (добавленные названия, пропущено_повторов)
+        """
+        added = []
+        duplicates = 0
+        with self.lock:
+            for name, catnr in entries:
+                catnr = catnr_key(catnr)
+                if catnr in self.by_catnr:
+                    duplicates += 1
+                    continue
+                name = name or f"CATNR {catnr}"
+                if name in self.by_name:
+                    name = f"{name} ({catnr})"
+                    if name in self.by_name:
+                        duplicates += 1
+                        continue
+                rec = SatRecord(name, catnr_url(catnr), group)
+                self.records.append(rec)
+                self.by_name[name] = rec
+                self.by_catnr[catnr] = rec
+                added.append(name)
+        return added, duplicates
+
+    def update(self, idx, name, url):
+        """Изменить название/URL спутника по позиции в списке."""
+        with self.lock:
+            rec = self.records[idx]
+            other = self.by_name.get(name)
+            if other is not None and other is not rec:
+                raise ValueError(f"Спутник «{name}» уже есть в списке.")
+            if url != rec.url:
+                # Другой источник — старые данные к нему не относятся
+                rec.url = url
+                rec.catnr = parse_catnr_url(url)
+                rec.reset_state()
+            rec.name = name
+            self._reindex()
+            return rec
+
+    def remove(self, idx):
+        with self.lock:
+            rec = self.records.pop(idx)
+            self._reindex()
+            return rec
+
+    # ---- состояние загрузки (nuUpdaterState.json) ----
+    def load_state(self, path):
+        """Прочитать сохранённое состояние и применить к спутникам списка."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict):
+            return
+        with self.lock:
+            self.saved_state = data
+            for rec in self.records:
+                if rec.block is None:
+                    self._apply_saved_state(rec)
+
+    def save_state(self, path):
+        with self.lock:
+            for rec in self.records:
+                if rec.block is None:
+                    continue
+                entry = {"url": rec.url}
+                for field in _STATE_FIELDS:
+                    entry[field] = getattr(rec, field)
+                self.saved_state[rec.name] = entry
+            # Удалённые из списка спутники в файле не храним
+            known = self.by_name
+            self.saved_state = {name: e for name, e in self.saved_state.items() if name in known}
+            data = json.dumps(self.saved_state, ensure_ascii=False)
+        atomic_write(path, data.encode("utf-8"))
+
+
+# ==========================
+# ИМПОРТ СПИСКОВ СПУТНИКОВ
+# ==========================
+CELESTRAK_GP_URL = "https://celestrak.org/NORAD/elements/gp.php"
+_GROUP_RE = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def catnr_url(catnr):
+    """Ссылка Celestrak на TLE одного спутника по номеру по каталогу."""
+    return f"{CELESTRAK_GP_URL}?CATNR={catnr_key(catnr)}&FORMAT=TLE"
+
+
+def group_url(group):
+    """Ссылка Celestrak на группу спутников (GROUP=...). ValueError для некорректного имени."""
+    group = group.strip()
+    if not _GROUP_RE.fullmatch(group):
+        raise ValueError(f"Некорректное имя группы Celestrak: «{group}».")
+    return f"{CELESTRAK_GP_URL}?GROUP={group}&FORMAT=TLE"
+
+
+def import_entries_from_tle(text):
+    """Список (name, catnr) из TLE/3LE-текста (например, nu.txt)."""
+    parser = TleStreamParser()
+    return [(record.name, record.catnr) for record in parser.records([text])]
+
+
+def import_entries_from_csv(text):
+    """
+    Список (name, catnr) из CSV. В каждой строке берётся первое числовое
+    поле как номер по каталогу и первое нечисловое как название; строки
+    без номера (в том числе заголовок) пропускаются. Разделитель — запятая,
+    точка с запятой или табуляция.
+    """
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+
+    entries = []
+    for row in csv.reader(io.StringIO(text), dialect):
+        name = ""
+        catnr = None
+        for cell in row:
+            cell = cell.strip()
+            if catnr is None and cell.isdigit():
+                catnr = cell
+            elif not name and cell:
+                name = cell
+        if catnr is not None:
+            entries.append((name, catnr))
+    return entries
+
+
+# ==========================
+# ПЛАНИРОВЩИК СВЕЖЕСТИ
+# ==========================
+class FreshnessTracker:
+    """
+    Решает по эпохе последнего TLE, времени последней проверки и
+    адаптивному периоду обновления элементов, стоит ли запрашивать спутник
+    в этом цикле, и подстраивает эти интервалы по результатам загрузки.
+    Состояние хранится в записях SatelliteStore.
+    """
+
+    def __init__(self):
+        self.max_age = DEFAULT_FRESHNESS_MAX_AGE
+
+    def is_due(self, rec, now):
+        """Нужно ли запрашивать спутник сейчас."""
+        if rec.block is None or rec.epoch is None:
+            return True
+
+        since_check = now - rec.checked_at
+        if since_check >= self.max_age:
+            return True
+        # Новые элементы ожидаются не раньше, чем через период после эпохи
+        if now < rec.epoch + rec.gap:
+            return False
+        return since_check >= rec.recheck
+
+    def fallback_age(self, rec, now, max_staleness):
+        """Возраст последней удачной копии или None, если она непригодна."""
+        if rec.block is None:
+            return None
+        age = now - rec.checked_at
+        return age if age <= max_staleness else None
+
+    def update(self, rec, block, now):
+        """Запомнить свежеполученный блок и подстроить интервалы."""
+        epoch = block_epoch(block)
+        old_epoch = rec.epoch if rec.block is not None else None
+
+        if epoch is not None and old_epoch is not None and epoch > old_epoch:
+            # Элементы обновились: сглаживаем наблюдаемый период
+            gap = 0.7 * rec.gap + 0.3 * (epoch - old_epoch)
+            rec.gap = max(MIN_EPOCH_GAP, min(MAX_EPOCH_GAP, gap))
+            rec.recheck = MIN_RECHECK
+        elif old_epoch is not None:
+            # Не изменилось — проверяем всё реже (до жёсткого предела)
+            rec.recheck = min(rec.recheck * 2, self.max_age)
+
+        rec.block = block
+        rec.epoch = epoch
+        rec.checked_at = now
+        if rec.catnr is None:
+            rec.catnr = block_catnr(block)
+
+
+# ==========================
+# ИЗМЕНЕНИЯ МЕЖДУ ЦИКЛАМИ
+# ==========================
+# Итог сравнения нового TLE спутника с предыдущим
+CHANGE_NEW = "new"              # раньше данных не было
+CHANGE_UPDATED = "changed"      # новая эпоха или другие элементы
+CHANGE_SAME = "unchanged"       # те же элементы (или спутник не запрашивался)
+CHANGE_STALE = "stale"          # загрузить не удалось, в файле старая копия или ничего
+CHANGE_KINDS = (CHANGE_NEW, CHANGE_UPDATED, CHANGE_SAME, CHANGE_STALE)
+
+# Скачки элементов между соседними TLE, при которых вероятен манёвр
+# (естественное торможение и шум TLE заметно меньше)
+MANEUVER_DA_KM = 1.0
+MANEUVER_DI_DEG = 0.02
+MANEUVER_DE = 0.0005
+
+EARTH_MU = 398600.4418          # км³/с²
+
+TleElements = namedtuple("TleElements", "epoch sma inclination eccentricity")
+
+
+def tle_elements(block):
+    """Эпоха, большая полуось (км), наклонение и эксцентриситет TLE-блока или None."""
+    _, line1, line2 = block_lines(block)
+    epoch = parse_tle_epoch(line1)
+    try:
+        mean_motion = float(line2[52:63]) * 2 * math.pi / 86400
+        inclination = float(line2[8:16])
+        eccentricity = float(f"0.{line2[26:33].strip()}")
+    except ValueError:
+        return None
+    if epoch is None or mean_motion <= 0:
+        return None
+    return TleElements(epoch, (EARTH_MU / mean_motion ** 2) ** (1 / 3), inclination, eccentricity)
+
+
+def maneuver_hints(old_block, new_block):
+    """Подсказки о манёвре по скачку элементов между двумя TLE (список строк)."""
+    old, new = tle_elements(old_block), tle_elements(new_block)
+    if old is None or new is None or new.epoch <= old.epoch:
+        return []
+    hints = []
+    da = new.sma - old.sma
+    if abs(da) >= MANEUVER_DA_KM:
+        hints.append(f"Δa {da:+.1f} км")
+    di = new.inclination - old.inclination
+    if abs(di) >= MANEUVER_DI_DEG:
+        hints.append(f"Δi {di:+.3f}°")
+    de = new.eccentricity - old.eccentricity
+    if abs(de) >= MANEUVER_DE:
+        hints.append(f"Δe {de:+.5f}")
+    return hints
+
+
+class ChangeReport:
+    """
+    Сравнение TLE цикла с предыдущими: какие спутники новые, изменились,
+    остались прежними или устарели, и у кого скачок элементов похож на
+    манёвр. По списку dirty движок решает, какие файлы вывода пересобирать.
+    """
+
+    def __init__(self):
+        self.names = {kind: [] for kind in CHANGE_KINDS}
+        self.maneuvers = []     # [(название, [подсказки])]
+        self.dirty = set()      # спутники, чей блок в файлах вывода изменился
+
+    def add(self, name, old_block, new_block):
+        """Спутник получен в этом цикле."""
+        if not old_block:
+            kind = CHANGE_NEW
+        elif old_block == new_block:
+            kind = CHANGE_SAME
+        else:
+            kind = CHANGE_UPDATED
+            hints = maneuver_hints(old_block, new_block)
+            if hints:
+                self.maneuvers.append((name, hints))
+        self.names[kind].append(name)
+        if kind != CHANGE_SAME:
+            self.dirty.add(name)
+
+    def add_unchanged(self, name):
+        self.names[CHANGE_SAME].append(name)
+
+    def add_stale(self, name):
+        """Загрузить не удалось."""
+        self.names[CHANGE_STALE].append(name)
+
+    def counts(self):
+        return {kind: len(names) for kind, names in self.names.items()}
+
+    def summary(self):
+        c = self.counts()
+        return (
+            f"новых {c[CHANGE_NEW]}, изменилось {c[CHANGE_UPDATED]}, "
+            f"без изменений {c[CHANGE_SAME]}, устарело {c[CHANGE_STALE]}"
+        )
+
+
+# ==========================
+# ОГРАНИЧЕНИЕ ЧАСТОТЫ ЗАПРОСОВ
+# ==========================
+class HostBackoffError(Exception):
+    """Запрос не отправлен: сервер на паузе после ограничения частоты."""
+
+
+def parse_retry_after(value):
+    """Заголовок Retry-After (секунды или HTTP-дата) в секунды или None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostLimiter:
+    """Token bucket, текущая доля потолка частоты и состояние паузы для одного сервера."""
+
+    def __init__(self, burst):
+        self.factor = 1.0
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.backoff_until = 0.0
+        self.backoff_level = 0
+        self.timeouts_in_row = 0
+
+    def refill(self, now, rate, burst):
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+    def slow_down(self):
+        self.factor = max(RATE_MIN_FACTOR, self.factor / 2)
+
+    def speed_up(self):
+        self.factor = min(1.0, self.factor + RATE_RECOVERY_STEP)
+
+    def backoff_remaining(self, now):
+        return max(0.0, self.backoff_until - now)
+
+    def start_backoff(self, now, retry_after=None):
+        """Пауза BACKOFF_BASE * 2^level с джиттером, но не меньше Retry-After."""
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** self.backoff_level))
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        self.backoff_until = max(self.backoff_until, now + delay)
+        self.backoff_level += 1
+        return delay
+
+
+class RateLimiter:
+    """
+    Ограничитель частоты запросов по серверам. Потокобезопасен:
+    потоки пула ждут свободный токен своего сервера, а к серверу на паузе
+    запросы не отправляются вовсе.
+
+    rate — потолок частоты (запросов в секунду); фактическая частота
+    сервера — rate * factor, factor снижается при ограничении и
+    восстанавливается удачными ответами. burst — запас токенов; 0 —
+    по числу параллельных запросов (parallel, задаёт движок).
+    """
+
+    def __init__(self, rate=DEFAULT_RATE_PER_SECOND, burst=DEFAULT_RATE_BURST, parallel=DEFAULT_MAX_PARALLEL):
+        self.rate = rate
+        self.burst = burst
+        self.parallel = parallel
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def effective_burst(self):
+        return self.burst or max(1, self.parallel)
+
+    def _host(self, url):
+        host = urlparse(url).netloc.lower()
+        limiter = self.hosts.get(host)
+        if limiter is None:
+            limiter = self.hosts[host] = HostLimiter(self.effective_burst())
+        return limiter
+
+    def acquire(self, url):
+        """
+        Дождаться токена для сервера url. Если сервер на паузе —
+        выбросить HostBackoffError, не дожидаясь её окончания.
+        """
+        while True:
+            with self.lock:
+                limiter = self._host(url)
+                now = time.monotonic()
+                remaining = limiter.backoff_remaining(now)
+                if remaining > 0:
+                    host = urlparse(url).netloc
+                    raise HostBackoffError(f"сервер {host} на паузе ещё {int(remaining)} с")
+                rate = self.rate * limiter.factor
+                limiter.refill(now, rate, self.effective_burst())
+                if limiter.tokens >= 1:
+                    limiter.tokens -= 1
+                    return
+                wait = (1 - limiter.tokens) / rate
+            time.sleep(wait)
+
+    def report_success(self, url):
+        with self.lock:
+            limiter = self._host(url)
+            limiter.backoff_level = 0
+            limiter.timeouts_in_row = 0
+            limiter.speed_up()
+
+    def report_rate_limited(self, url, retry_after=None):
+        """Сервер явно ограничил частоту (403/429/503). Возвращает длину паузы."""
+        with self.lock:
+            limiter = self._host(url)
+            limiter.timeouts_in_row = 0
+            limiter.slow_down()
+            return limiter.start_backoff(time.monotonic(), retry_after)
+
+    def report_timeout(self, url):
+        """
+        Таймаут одного URL. Пауза для всего сервера включается только после
+        HOST_TIMEOUT_THRESHOLD таймаутов подряд без единого удачного ответа.
+        Возвращает длину паузы или 0.
+        """
+        with self.lock:
+            limiter = self._host(url)
+            limiter.timeouts_in_row += 1
+            if limiter.timeouts_in_row < HOST_TIMEOUT_THRESHOLD:
+                return 0
+            limiter.timeouts_in_row = 0
+            limiter.slow_down()
+            return limiter.start_backoff(time.monotonic())
+
+    def backoff_remaining(self, urls):
+        """
+        Минимальная оставшаяся пауза среди серверов из urls: > 0, только
+        если на паузе все они (иначе цикл есть смысл запускать как обычно).
+        """
+        with self.lock:
+            now = time.monotonic()
+            hosts = {urlparse(u).netloc.lower() for u in urls}
+            remaining = [
+                self.hosts[h].backoff_remaining(now) if h in self.hosts else 0.0
+                for h in hosts
+            ]
+        return min(remaining) if remaining else 0.0
+
+    def snapshot(self):
+        """Список (host, tokens, burst, частота, пауза_сек, уровень) для статуса."""
+        with self.lock:
+            now = time.monotonic()
+            burst = self.effective_burst()
+            result = []
+            for host, limiter in self.hosts.items():
+                rate = self.rate * limiter.factor
+                limiter.refill(now, rate, burst)
+                result.append((host, limiter.tokens, burst, rate,
+                               limiter.backoff_remaining(now), limiter.backoff_level))
+        return result
+
+
+# ==========================
+# НАСТРОЙКИ
+# ==========================
+INTERVAL_UNITS = ("секунд", "минут", "часов")
+
+
+# Задержка, за которую частые изменения настроек сливаются в одну запись
+SETTINGS_SAVE_DELAY = 2.0
+
+
+class SettingsFile:
+    """
+    Файл настроек JSON. Запись атомарная (временный файл + переименование),
+    перед ней предыдущая корректная версия переносится в резервную копию
+    <файл>.bak. Неизменившиеся настройки повторно не записываются. Если
+    основной файл повреждён, load() читает резервную копию.
+    """
+
+    def __init__(self, path=SETTINGS_FILE):
+        self.path = path
+        self.backup_path = path + ".bak"
+        self.dirty = False
+        self.last_text = None
+        self.recovered = False   # настройки взяты из резервной копии
+        self.load_error = None   # ошибка чтения основного файла
+
+    @staticmethod
+    def _dumps(data):
+        return json.dumps(data, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def _read(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("ожидался объект JSON")
+        return data
+
+    def load(self):
+        """Прочитать настройки. Возвращает словарь (пустой, если файла нет)."""
+        self.recovered = False
+        self.load_error = None
+        try:
+            data = self._read(self.path)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            self.load_error = str(e)
+            try:
+                data = self._read(self.backup_path)
+            except (OSError, ValueError):
+                return {}
+            self.recovered = True
+            # Основной файл перезапишется при первом сохранении
+            self.dirty = True
+            return data
+        self.last_text = self._dumps(data)
+        return data
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    def save(self, data):
+        """
+        Записать настройки, если они изменились. Возвращает True, если файл
+        был записан. Ошибки записи (OSError) пробрасываются, dirty при этом
+        остаётся выставленным.
+        """
+        text = self._dumps(data)
+        if text == self.last_text and not self.recovered:
+            self.dirty = False
+            return False
+
+        # Предыдущая корректная версия становится резервной копией
+        try:
+            with open(self.path, "rb") as f:
+                previous = f.read()
+            json.loads(previous.decode("utf-8"))
+        except (OSError, ValueError):
+            previous = None
+        if previous is not None:
+            atomic_write(self.backup_path, previous)
+
+        atomic_write(self.path, text.encode("utf-8"))
+        self.last_text = text
+        self.dirty = False
+        self.recovered = False
+        return True
+
+
+def read_settings(path=SETTINGS_FILE):
+    """Прочитать файл настроек (или его резервную копию). Возвращает словарь."""
+    return SettingsFile(path).load()
+
+
+def interval_to_seconds(value, unit):
+    """
+    Перевести интервал из настроек ("10", "минут") в секунды.
+    Выбрасывает ValueError при некорректном значении.
+    """
+    try:
+        val = float(str(value).replace(",", "."))
+    except ValueError:
+        raise ValueError("Некорректный интервал.") from None
+    if val <= 0:
+        raise ValueError("Интервал должен быть больше нуля.")
+    if unit == "минут":
+        val *= 60
+    elif unit == "часов":
+        val *= 3600
+    seconds = int(val)
+    if seconds <= 0:
+        raise ValueError("Слишком маленький интервал.")
+    return seconds
+
+
+# ==========================
+# ФОРМАТЫ ВЫВОДА
+# ==========================
+FORMAT_TLE2 = "tle2"            # только строки 1 и 2
+FORMAT_TLE3 = "tle3"            # строка имени + строки 1 и 2 (как nu.txt)
+FORMAT_OMM_JSON = "omm_json"    # OMM в JSON, как GP-запрос Celestrak FORMAT=JSON
+FORMAT_OMM_CSV = "omm_csv"      # OMM в CSV, как FORMAT=CSV
+OUTPUT_FORMATS = (FORMAT_TLE2, FORMAT_TLE3, FORMAT_OMM_JSON, FORMAT_OMM_CSV)
+
+OMM_FIELDS = (
+    "OBJECT_NAME", "OBJECT_ID", "EPOCH", "MEAN_MOTION", "ECCENTRICITY",
+    "INCLINATION", "RA_OF_ASC_NODE", "ARG_OF_PERICENTER", "MEAN_ANOMALY",
+    "EPHEMERIS_TYPE", "CLASSIFICATION_TYPE", "NORAD_CAT_ID", "ELEMENT_SET_NO",
+    "REV_AT_EPOCH", "BSTAR", "MEAN_MOTION_DOT", "MEAN_MOTION_DDOT",
+)
+
+# Профиль вывода: файл, набор спутников и формат. satellites/groups —
+# кортежи названий спутников и групп; если оба пусты, берутся спутники,
+# выбранные в окне (основной список)
+OutputProfile = namedtuple("OutputProfile", "name path satellites groups format")
+
+
+def block_lines(block):
+    """TLE-блок в (имя, строка 1, строка 2); имени может не быть."""
+    name = ""
+    line1 = line2 = ""
+    for line in block.splitlines():
+        if line.startswith("1 "):
+            line1 = line
+        elif line.startswith("2 "):
+            line2 = line
+        elif line.strip():
+            name = line.strip()
+    return name, line1, line2
+
+
+def _tle_exp_float(field):
+    """Поле TLE с подразумеваемой точкой и порядком (" 12345-4" → 0.12345e-4)."""
+    field = field.strip()
+    if not field:
+        return 0.0
+    sign = -1.0 if field[0] == "-" else 1.0
+    field = field.lstrip("+-")
+    split = max(field.rfind("-"), field.rfind("+"))
+    if split <= 0:
+        return sign * float(f"0.{field}")
+    return sign * float(f"0.{field[:split]}e{field[split:]}")
+
+
+def omm_fields(name, line1, line2):
+    """Элементы TLE как словарь полей OMM (в порядке OMM_FIELDS)."""
+    yy = line1[9:11].strip()
+    if yy.isdigit():
+        year = 2000 + int(yy) if int(yy) < 57 else 1900 + int(yy)
+        object_id = f"{year}-{line1[11:17].strip()}"
+    else:
+        object_id = ""
+    epoch = parse_tle_epoch(line1)
+    catnr = catnr_key(line1[2:7])
+    return {
+        "OBJECT_NAME": name,
+        "OBJECT_ID": object_id,
+        "EPOCH": datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f"),
+        "MEAN_MOTION": float(line2[52:63]),
+        "ECCENTRICITY": float(f"0.{line2[26:33].strip()}"),
+        "INCLINATION": float(line2[8:16]),
+        "RA_OF_ASC_NODE": float(line2[17:25]),
+        "ARG_OF_PERICENTER": float(line2[34:42]),
+        "MEAN_ANOMALY": float(line2[43:51]),
+        "EPHEMERIS_TYPE": int(line1[62]) if line1[62].isdigit() else 0,
+        "CLASSIFICATION_TYPE": line1[7],
+        "NORAD_CAT_ID": int(catnr) if catnr.isdigit() else catnr,
+        "ELEMENT_SET_NO": int(line1[64:68]) if line1[64:68].strip().isdigit() else 0,
+        "REV_AT_EPOCH": int(line2[63:68]) if line2[63:68].strip().isdigit() else 0,
+        "BSTAR": _tle_exp_float(line1[53:61]),
+        "MEAN_MOTION_DOT": float(line1[33:43]),
+        "MEAN_MOTION_DDOT": _tle_exp_float(line1[44:52]),
+    }
+
+
+def render_output(blocks, fmt):
+    """Текст файла вывода из TLE-блоков в формате fmt (один из OUTPUT_FORMATS)."""
+    if fmt == FORMAT_TLE3:
+        return "\n".join(blocks) + "\n"
+
+    lines = [block_lines(block) for block in blocks]
+    if fmt == FORMAT_TLE2:
+        return "".join(f"{line1}\n{line2}\n" for _, line1, line2 in lines)
+
+    omm = [omm_fields(name, line1, line2) for name, line1, line2 in lines]
+    if fmt == FORMAT_OMM_JSON:
+        return json.dumps(omm, ensure_ascii=False, indent=2) + "\n"
+    if fmt == FORMAT_OMM_CSV:
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=OMM_FIELDS, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(omm)
+        return out.getvalue()
+    raise ValueError(f"Неизвестный формат вывода: {fmt}")
+
+
+def parse_output_profiles(items):
+    """Разобрать список профилей вывода из настроек; некорректные пропускаются."""
+    profiles = []
+    if not isinstance(items, list):
+        return profiles
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        path = item.get("path")
+        fmt = item.get("format", FORMAT_TLE3)
+        if not isinstance(path, str) or not path or fmt not in OUTPUT_FORMATS:
+            continue
+        sats = item.get("satellites") or []
+        groups = item.get("groups") or []
+        profiles.append(OutputProfile(
+            str(item.get("name") or path),
+            path,
+            tuple(n for n in sats if isinstance(n, str)) if isinstance(sats, list) else (),
+            tuple(g.upper() for g in groups if isinstance(g, str)) if isinstance(groups, list) else (),
+            fmt,
+        ))
+    return profiles
+
+
+def profile_to_settings(profile):
+    return {
+        "name": profile.name,
+        "path": profile.path,
+        "satellites": list(profile.satellites),
+        "groups": list(profile.groups),
+        "format": profile.format,
+    }
+
+
+# ==========================
+# РАСПИСАНИЕ АВТООБНОВЛЕНИЯ
+# ==========================
+# Дольше этого планировщик не спит, даже если до обновления несколько
+# часов: так спящий режим компьютера замечается не позже чем через 5 минут
+SCHEDULE_WAKE_MAX = 5 * 60
+MAIN_SCHEDULE = "основное"
+
+
+def parse_group_schedules(items):
+    """
+    Разобрать список расписаний групп из настроек:
+    [{"group": "STARLINK", "interval_value": "6", "interval_unit": "часов"}, ...].
+    Возвращает [(группа, секунды)]; некорректные записи пропускаются.
+    """
+    result = []
+    if not isinstance(items, list):
+        return result
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get("group"), str):
+            continue
+        try:
+            seconds = interval_to_seconds(item.get("interval_value", ""), item.get("interval_unit", "минут"))
+        except ValueError:
+            continue
+        result.append((item["group"].strip().upper(), seconds))
+    return result
+
+
+class Schedule:
+    """Одно расписание: интервал, группы спутников (None — все остальные) и срок."""
+
+    __slots__ = ("name", "interval", "groups", "due", "wall_due")
+
+    def __init__(self, name, interval, groups, now, wall):
+        self.name = name
+        self.interval = interval
+        self.groups = groups
+        self.due = now
+        self.wall_due = wall
+
+
+class Scheduler:
+    """
+    Несколько расписаний автообновления со сроками по time.monotonic().
+    Сроки отсчитываются от предыдущего срока, а не от конца загрузки,
+    поэтому время загрузки и задержки цикла событий не накапливаются.
+
+    Параллельно ведётся срок по настенным часам: на части систем
+    monotonic не идёт во время спящего режима, и пропущенные циклы
+    замечаются по time.time(). Пропущенные циклы догоняются одним
+    обновлением.
+    """
+
+    def __init__(self, clock=time.monotonic, wall_clock=time.time):
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.schedules = []
+
+    def add(self, name, interval, groups=None):
+        """Добавить расписание; первый срок — сейчас."""
+        schedule = Schedule(name, interval, groups, self.clock(), self.wall_clock())
+        self.schedules.append(schedule)
+        return schedule
+
+    def due_schedules(self):
+        now = self.clock()
+        wall = self.wall_clock()
+        return [s for s in self.schedules if now >= s.due or wall >= s.wall_due]
+
+    def advance(self, schedule):
+        """
+        Перенести срок расписания на следующий интервал после текущего
+        момента. Возвращает число пропущенных целиком интервалов (>0 после
+        спящего режима или долгой паузы).
+        """
+        now = self.clock()
+        wall = self.wall_clock()
+        late = max(now - schedule.due, wall - schedule.wall_due, 0)
+        missed = int(late // schedule.interval)
+        remaining = schedule.interval - late % schedule.interval
+        schedule.due = now + remaining
+        schedule.wall_due = wall + remaining
+        return missed
+
+    def postpone(self, delay):
+        """Не запускать ни одно расписание раньше, чем через delay секунд."""
+        now = self.clock()
+        wall = self.wall_clock()
+        for s in self.schedules:
+            if s.due < now + delay:
+                s.due = now + delay
+                s.wall_due = wall + delay
+
+    def next_delay(self):
+        """Сколько секунд до ближайшего срока (0 — уже пора)."""
+        if not self.schedules:
+            return None
+        now = self.clock()
+        wall = self.wall_clock()
+        return max(0.0, min(min(s.due - now, s.wall_due - wall) for s in self.schedules))
+
+    def names_due(self, due, selected_names, store):
+        """Спутники из selected_names, расписания которых есть в due."""
+        grouped = {}
+        main = None
+        for s in self.schedules:
+            if s.groups is None:
+                main = s
+            else:
+                for group in s.groups:
+                    grouped[group] = s
+        due = set(due)
+        names = set()
+        for name in selected_names:
+            rec = store.get(name)
+            if rec is None:
+                continue
+            if grouped.get(rec.group_name(), main) in due:
+                names.add(name)
+        return names
+
+
+def build_scheduler(main_interval, group_schedules):
+    """Основное расписание для всех спутников плюс отдельные для групп."""
+    scheduler = Scheduler()
+    scheduler.add(MAIN_SCHEDULE, main_interval)
+    for group, seconds in group_schedules:
+        scheduler.add(group, seconds, {group})
+    return scheduler
+
+
+# ==========================
+# МЕТРИКИ
+# ==========================
+# Фазы запроса, которые замеряются для каждого спутника
+REQUEST_PHASES = ("dns", "connect", "tls", "first_byte", "body", "parse")
+
+CACHE_HIT = "hit"    # 304, данные из кэша ответов
+CACHE_MISS = "miss"  # полный ответ
+CACHE_SHARED = "shared"  # из общего кэша, без запроса к серверу
+
+# Замер текущего запроса; соединения urllib3 открываются в том же потоке
+_timing_local = threading.local()
+
+
+class RequestTiming:
+    """Замер одного HTTP-запроса: фазы (секунды), байты, статус, кэш."""
+
+    __slots__ = ("label", "url", "status", "cache", "bytes", "total") + REQUEST_PHASES
+
+    def __init__(self, label, url):
+        self.label = label
+        self.url = url
+        self.status = None   # код HTTP или "error"
+        self.cache = None
+        self.bytes = 0
+        self.total = 0.0
+        for phase in REQUEST_PHASES:
+            setattr(self, phase, 0.0)
+
+
+def current_request_timing():
+    return getattr(_timing_local, "timing", None)
+
+
+_timed_adapter_class = None
+
+
+def _install_timed_create_connection():
+    """
+    Обернуть urllib3.util.connection.create_connection (публичная функция,
+    через неё открывают сокеты соединения urllib3 1.x и 2.x): при активном
+    RequestTiming имя разрешается здесь с замером DNS, затем адреса
+    перебираются по порядку исходной функцией с уже готовым IP, поэтому
+    имя не разрешается дважды, а опции сокета и тайм-ауты остаются за
+    urllib3. Без замера вызов уходит в исходную функцию как есть.
+    """
+    import socket
+    from urllib3.util import connection
+
+    original = connection.create_connection
+    if getattr(original, "timed", False) or not hasattr(connection, "allowed_gai_family"):
+        return
+
+    def create_connection(address, *args, **kwargs):
+        timing = current_request_timing()
+        if timing is None:
+            return original(address, *args, **kwargs)
+        host, port = address
+        t0 = time.perf_counter()
+        try:
+            infos = socket.getaddrinfo(host.strip("[]"), port, connection.allowed_gai_family(), socket.SOCK_STREAM)
+        except OSError:
+            infos = []
+        t1 = time.perf_counter()
+        timing.dns += t1 - t0
+        try:
+            if not infos:
+                # Ошибку разрешения имени сообщит исходная функция
+                return original(address, *args, **kwargs)
+            error = None
+            for *_, sockaddr in infos:
+                try:
+                    return original((sockaddr[0], port), *args, **kwargs)
+                except OSError as e:
+                    error = e
+            raise error
+        finally:
+            timing.connect += time.perf_counter() - t1
+
+    create_connection.timed = True
+    connection.create_connection = create_connection
+
+
+def timed_http_adapter_class():
+    """
+    HTTPAdapter, соединения которого замеряют DNS, TCP-соединение и TLS
+    для текущего RequestTiming (DNS и TCP — через обёртку create_connection).
+    Классы создаются при первом вызове, чтобы requests импортировался только
+    при первой загрузке.
+    """
+    global _timed_adapter_class
+    if _timed_adapter_class is not None:
+        return _timed_adapter_class
+
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    _install_timed_create_connection()
+
+    class TimedConnectionMixin:
+        def connect(self):
+            # DNS и TCP замеряет create_connection; остаток connect() — TLS
+            timing = current_request_timing()
+            before = timing.dns + timing.connect if timing is not None else 0.0
+            t0 = time.perf_counter()
+            super().connect()
+            if timing is not None and isinstance(self, HTTPSConnection):
+                spent = time.perf_counter() - t0 - (timing.dns + timing.connect - before)
+                timing.tls += max(0.0, spent)
+
+    class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+        pass
+
+    class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+        pass
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = TimedHTTPConnection
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+
+    class TimedHTTPAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": TimedHTTPConnectionPool,
+                "https": TimedHTTPSConnectionPool,
+            }
+
+    _timed_adapter_class = TimedHTTPAdapter
+    return _timed_adapter_class
+
+
+class CycleMetrics:
+    """Метрики одного цикла загрузки."""
+
+    __slots__ = ("started", "duration", "fetch", "write", "status", "satellites", "changes", "requests")
+
+    def __init__(self, started):
+        self.started = started      # Unix-время начала
+        self.duration = 0.0
+        self.fetch = 0.0            # загрузка и разбор
+        self.write = 0.0            # запись файлов
+        self.status = None
+        self.satellites = {}        # {STATUS_*: число спутников}
+        self.changes = {}           # {CHANGE_*: число спутников}
+        self.requests = []          # RequestTiming (добавляются из пула потоков)
+
+    @property
+    def bytes(self):
+        return sum(t.bytes for t in self.requests)
+
+    def cache_count(self, kind):
+        return sum(1 for t in self.requests if t.cache == kind)
+
+    def phase_total(self, phase):
+        return sum(getattr(t, phase) for t in self.requests)
+
+
+def _prom_escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRegistry:
+    """
+    Накопленные метрики всех циклов и их выдача в текстовом формате
+    Prometheus (для node_exporter textfile или HTTP-эндпоинта /metrics).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last = None
+        self.last_success = 0.0
+        self.cycles = {}            # {статус цикла: число}
+        self.requests = {}          # {(кэш, код): число}
+        self.bytes = 0
+        self.phase_sum = dict.fromkeys(REQUEST_PHASES, 0.0)
+        self.timed_requests = 0
+
+    def add_cycle(self, metrics):
+        with self.lock:
+            self.last = metrics
+            self.cycles[metrics.status] = self.cycles.get(metrics.status, 0) + 1
+            if metrics.status in (RESULT_WRITTEN, RESULT_UNCHANGED):
+                self.last_success = metrics.started + metrics.duration
+            for timing in metrics.requests:
+                key = (timing.cache or "none", str(timing.status))
+                self.requests[key] = self.requests.get(key, 0) + 1
+                self.bytes += timing.bytes
+                for phase in REQUEST_PHASES:
+                    self.phase_sum[phase] += getattr(timing, phase)
+                self.timed_requests += 1
+
+    def prometheus_text(self):
+        p = APP_NAME.lower()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{_prom_escape(v)}"' for k, v in labels)
+                lines.append(f"{p}_{name}{{{label_text}}} {value}" if label_text else f"{p}_{name} {value}")
+
+        with self.lock:
+            metric("cycles_total", "counter", "Download cycles by result.",
+                   [((("status", k),), v) for k, v in sorted(self.cycles.items())])
+            metric("http_requests_total", "counter", "HTTP requests by cache result and status code.",
+                   [((("cache", c), ("code", code)), v) for (c, code), v in sorted(self.requests.items())])
+            metric("http_response_bytes_total", "counter", "Response bytes received.", [((), self.bytes)])
+            metric("http_request_phase_seconds_sum", "counter", "Total time per request phase.",
+                   [((("phase", ph),), f"{self.phase_sum[ph]:.6f}") for ph in REQUEST_PHASES])
+            metric("http_request_phase_seconds_count", "counter", "Requests included in phase sums.",
+                   [((), self.timed_requests)])
+            metric("last_success_timestamp_seconds", "gauge", "End of the last successful cycle.",
+                   [((), f"{self.last_success:.0f}")])
+            last = self.last
+            if last is not None:
+                metric("last_cycle_seconds", "gauge", "Duration of the last cycle by stage.",
+                       [((("stage", "total"),), f"{last.duration:.6f}"),
+                        ((("stage", "fetch"),), f"{last.fetch:.6f}"),
+                        ((("stage", "write"),), f"{last.write:.6f}")])
+                metric("last_cycle_satellites", "gauge", "Satellites in the last cycle by source.",
+                       [((("state", k),), v) for k, v in sorted(last.satellites.items())])
+                metric("last_cycle_changes", "gauge", "Satellites in the last cycle by change against the previous one.",
+                       [((("kind", k),), v) for k, v in sorted(last.changes.items())])
+                metric("last_cycle_requests", "gauge", "HTTP requests in the last cycle.",
+                       [((), len(last.requests))])
+        return "\n".join(lines) + "\n"
+
+
+class MetricsHttpServer:
+    """Локальный HTTP-эндпоинт /metrics (127.0.0.1) в фоновом потоке."""
+
+    def __init__(self, registry, port, host="127.0.0.1"):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# ==========================
+# ЛОКАЛЬНЫЙ TLE-СЕРВЕР
+# ==========================
+# Дольше этого long-poll запрос (?wait=) не держится, секунд
+TLE_SERVER_WAIT_MAX = 300
+# Пустое сообщение в потоке SSE, чтобы прокси не закрывали соединение
+TLE_SERVER_KEEPALIVE = 15
+
+_FORMAT_CONTENT_TYPES = {
+    FORMAT_TLE2: "text/plain; charset=utf-8",
+    FORMAT_TLE3: "text/plain; charset=utf-8",
+    FORMAT_OMM_JSON: "application/json; charset=utf-8",
+    FORMAT_OMM_CSV: "text/csv; charset=utf-8",
+}
+
+
+class TleFeed:
+    """
+    Текущий набор TLE для локального сервера. Движок публикует его после
+    каждого цикла; версия растёт, только если данные изменились, и тогда
+    ожидающие клиенты (long-poll, SSE) будут разбужены.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.version = 0
+        self.entries = {}       # {название: (catnr, группа, блок)} в порядке вывода
+        self.changed = ()       # названия, изменившиеся в последней версии
+        self.bodies = {}        # {(вид, ключ, формат): (etag, тело)} для текущей версии
+        self.closed = False
+
+    def publish(self, records):
+        """Опубликовать записи SatRecord; возвращает изменившиеся названия."""
+        entries = {
+            rec.name: (rec.catnr, rec.group_name(), rec.block)
+            for rec in records if rec.block and rec.status != STATUS_FAILED
+        }
+        with self.cond:
+            if entries == self.entries and list(entries) == list(self.entries):
+                return []
+            old = self.entries
+            changed = [name for name, entry in entries.items() if old.get(name) != entry]
+            changed.extend(name for name in old if name not in entries)
+            self.entries = entries
+            self.changed = tuple(changed)
+            self.version += 1
+            self.bodies = {}
+            self.cond.notify_all()
+        return changed
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def wait_change(self, version, timeout):
+        """Ждать версию новее version; возвращает (версия, изменившиеся)."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.version != version or self.closed, timeout)
+            return self.version, self.changed
+
+    def _blocks(self, kind, key):
+        if kind == "all":
+            return [entry[2] for entry in self.entries.values()]
+        if kind == "group":
+            key = key.upper()
+            return [entry[2] for entry in self.entries.values() if entry[1] == key]
+        # kind == "sat": номер по каталогу или название
+        entry = self.entries.get(key)
+        if entry is None and key.strip().isdigit():
+            catnr = catnr_key(key)
+            entry = next((e for e in self.entries.values() if e[0] == catnr), None)
+        return [entry[2]] if entry else []
+
+    def render(self, kind, key, fmt):
+        """
+        (версия, etag, тело) выборки или (версия, None, None), если она пуста.
+        ETag считается по содержимому: если выборка клиента не изменилась,
+        он получит 304 и после смены версии набора.
+        """
+        with self.cond:
+            cached = self.bodies.get((kind, key, fmt))
+            if cached is None:
+                blocks = self._blocks(kind, key)
+                if blocks:
+                    body = render_output(blocks, fmt).encode("utf-8")
+                    etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+                    cached = (etag, body)
+                else:
+                    cached = (None, None)
+                self.bodies[(kind, key, fmt)] = cached
+            return (self.version,) + cached
+
+    def index(self):
+        """Сводка для корня сервера: версия, спутники и группы."""
+        with self.cond:
+            groups = {}
+            for catnr, group, _ in self.entries.values():
+                groups[group] = groups.get(group, 0) + 1
+            return {
+                "version": self.version,
+                "satellites": len(self.entries),
+                "groups": groups,
+            }
+
+
+def _etag_matches(header, etag):
+    if not header or etag is None:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+class TleHttpServer:
+    """
+    Раздача текущих TLE по HTTP, чтобы клиенты в сети не перечитывали nu.txt:
+
+        GET /                        сводка (JSON): версия, число спутников, группы
+        GET /tle                     все спутники цикла
+        GET /tle/<номер|название>    один спутник
+        GET /group/<группа>          спутники группы
+        GET /events                  server-sent events при изменении данных
+
+    Параметры: ?format=tle3|tle2|omm_json|omm_csv (по умолчанию tle3, как
+    nu.txt); ?wait=<сек> вместе с If-None-Match — long-poll: ответ
+    задерживается, пока выборка не изменится (иначе 304 по истечении).
+    """
+
+    def __init__(self, feed, port, host="127.0.0.1"):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        from urllib.parse import unquote
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def send_body(self, code, body, content_type, headers=()):
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def send_text(self, code, text, headers=()):
+                self.send_body(code, text.encode("utf-8"), "text/plain; charset=utf-8", headers)
+
+            def do_HEAD(self):
+                self.do_GET()
+
+            def do_GET(self):
+                path, _, query = self.path.partition("?")
+                params = parse_qs(query)
+                parts = [unquote(p) for p in path.split("/") if p]
+
+                if not parts:
+                    body = json.dumps(feed.index(), ensure_ascii=False).encode("utf-8")
+                    self.send_body(200, body, "application/json; charset=utf-8")
+                elif parts == ["events"]:
+                    self.stream_events()
+                elif parts[0] == "tle" and len(parts) <= 2:
+                    self.send_selection("sat" if len(parts) == 2 else "all", parts[1] if len(parts) == 2 else "", params)
+                elif parts[0] == "group" and len(parts) == 2:
+                    self.send_selection("group", parts[1], params)
+                else:
+                    self.send_text(404, "Нет такого адреса.\n")
+
+            def send_selection(self, kind, key, params):
+                fmt = params.get("format", [FORMAT_TLE3])[0]
+                if fmt not in OUTPUT_FORMATS:
+                    self.send_text(400, f"Неизвестный формат: {fmt}\n")
+                    return
+                try:
+                    wait = min(float(params.get("wait", ["0"])[0]), TLE_SERVER_WAIT_MAX)
+                except ValueError:
+                    wait = 0
+                if_none_match = self.headers.get("If-None-Match")
+
+                version, etag, body = feed.render(kind, key, fmt)
+                # Long-poll: держим запрос, пока выборка совпадает с клиентской
+                deadline = time.monotonic() + wait
+                while (wait > 0 and _etag_matches(if_none_match, etag) and not feed.closed
+                       and time.monotonic() < deadline):
+                    feed.wait_change(version, deadline - time.monotonic())
+                    version, etag, body = feed.render(kind, key, fmt)
+
+                headers = [("Cache-Control", "no-cache"), ("X-TLE-Version", str(version))]
+                if body is None:
+                    if version == 0:
+                        self.send_text(503, "Данных ещё нет: первый цикл загрузки не завершён.\n",
+                                       headers + [("Retry-After", "30")])
+                    else:
+                        self.send_text(404, "Нет данных для этой выборки.\n", headers)
+                    return
+                headers.append(("ETag", etag))
+                if _etag_matches(if_none_match, etag):
+                    self.send_response(304)
+                    for name, value in headers:
+                        self.send_header(name, value)
+                    self.end_headers()
+                    return
+                self.send_body(200, body, _FORMAT_CONTENT_TYPES[fmt], headers)
+
+            def stream_events(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                # Клиент после переподключения присылает последнюю версию;
+                # если с тех пор данные менялись, сразу сообщаем об этом
+                try:
+                    version = int(self.headers.get("Last-Event-ID", ""))
+                except ValueError:
+                    version = feed.version
+                try:
+                    self.wfile.write(f"retry: {TLE_SERVER_KEEPALIVE * 1000}\n\n".encode())
+                    self.wfile.flush()
+                    while not feed.closed:
+                        new_version, changed = feed.wait_change(version, TLE_SERVER_KEEPALIVE)
+                        if new_version == version:
+                            self.wfile.write(b": keepalive\n\n")
+                        else:
+                            # Пропущено несколько версий — список изменений неполный,
+                            # клиенту нужно перечитать всё (changed: null)
+                            data = {
+                                "version": new_version,
+                                "changed": list(changed) if new_version == version + 1 else None,
+                            }
+                            message = f"event: update\nid: {new_version}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+                            self.wfile.write(message.encode("utf-8"))
+                            version = new_version
+                        self.wfile.flush()
+                except OSError:
+                    pass    # клиент отключился
+
+        self.feed = feed
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="tle-server", daemon=True).start()
+
+    def close(self):
+        self.feed.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# ==========================
+# ДВИЖОК ЗАГРУЗКИ TLE
+# ==========================
+DownloadResult = namedtuple("DownloadResult", "cooldown status error metrics changes", defaults=(None, None))
+
+# Значения DownloadResult.status
+RESULT_WRITTEN = "written"
+RESULT_UNCHANGED = "unchanged"
+RESULT_WRITE_ERROR = "write_error"
+RESULT_NO_DATA = "no_data"
+RESULT_ERROR = "error"      # цикл прерван непредвиденной ошибкой
+
+
+class TleEngine:
+    """
+    Загрузка, разбор и запись TLE без привязки к интерфейсу.
+    Используется и окном (nuGui), и консольным режимом (--headless).
+
+    log — функция для сообщений; вызывается из рабочих потоков,
+    поэтому должна быть потокобезопасной. То же относится к progress.
+    """
+
+    def __init__(self, log=print, progress=None):
+        self.log = log
+        # progress(done, total) — ход загрузки цикла (вызывается из рабочего потока)
+        self.progress = progress
+
+        self.store = SatelliteStore(DEFAULT_SATELLITES)
+        self.output_filename = "nu.txt"
+
+        self.max_parallel = DEFAULT_MAX_PARALLEL
+        self.http_pool_size = DEFAULT_HTTP_POOL_SIZE
+        self.http_session = None
+        self.http_cache = HttpCache(HTTP_CACHE_FILE)
+        # История полученных TLE (только новые эпохи)
+        self.archive = TleArchive()
+        self.archive_enabled = True
+        # Общий с другими копиями кэш (папка из настроек) или None
+        self.shared_cache = None
+        self.state_file = SAT_STATE_FILE
+        self.freshness = FreshnessTracker()
+        self.freshness_enabled = True
+        self.max_staleness = DEFAULT_MAX_STALENESS
+        self.rate_limiter = RateLimiter()
+
+        # Групповые запросы
+        self.bulk_catalog_urls = list(DEFAULT_BULK_CATALOG_URLS)
+        self.bulk_threshold = DEFAULT_BULK_THRESHOLD
+        self.bulk_catalog = {}
+        self.bulk_catalog_time = 0
+
+        # Расписания групп из настроек (разбираются parse_group_schedules)
+        self.group_schedules = []
+
+        # Дополнительные файлы вывода (OutputProfile) из общей загрузки
+        self.output_profiles = []
+
+        # Последняя записанная (или совпавшая с диском) выборка каждого файла
+        # вывода: {путь: (названия, формат, размер, mtime_ns)}. Если выборка
+        # та же, её спутники не изменились и файл на диске тот же (по stat),
+        # файл не пересобирается и не читается
+        self.output_state = {}
+
+        # Метрики циклов и их выгрузка для мониторинга (textfile/HTTP)
+        self.metrics = MetricsRegistry()
+        self.metrics_textfile = ""
+        self.metrics_port = 0
+        self.metrics_server = None
+
+        # Локальная раздача TLE по HTTP (порт 0 — выключена)
+        self.tle_feed = TleFeed()
+        self.tle_server_host = "127.0.0.1"
+        self.tle_server_port = 0
+        self.tle_server = None
+
+    def open(self):
+        """Загрузить кэши с диска. HTTP-сессия создаётся при первой загрузке."""
+        self.http_cache.load()
+        self.store.load_state(self.state_file)
+
+    def start_servers(self, selected_sats=()):
+        """
+        Запустить включённые в настройках локальные серверы (TLE, метрики).
+        До первого цикла TLE-сервер раздаёт сохранённые копии selected_sats.
+        """
+        if self.tle_server_port and self.tle_server is None:
+            try:
+                self.tle_server = TleHttpServer(self.tle_feed, self.tle_server_port, self.tle_server_host)
+                self.log(f"Сервер TLE: http://{self.tle_server_host}:{self.tle_server_port}/tle")
+            except OSError as e:
+                self.log(f"⚠ Не удалось открыть порт сервера TLE {self.tle_server_port}: {e}")
+                self.tle_server_port = 0
+        if self.tle_feed.version == 0:
+            self.tle_feed.publish(self.store.get(name) for name in selected_sats if self.store.get(name))
+        self.export_metrics()
+
+    def close(self):
+        """Остановить локальные серверы."""
+        if self.tle_server is not None:
+            self.tle_server.close()
+            self.tle_server = None
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+            self.metrics_server = None
+
+    # ==========================
+    # НАСТРОЙКИ ДВИЖКА
+    # ==========================
+    def apply_settings(self, data):
+        """Взять из словаря настроек параметры движка и список спутников."""
+        # Параллельные запросы
+        max_parallel = data.get("max_parallel")
+        if isinstance(max_parallel, int) and 1 <= max_parallel <= MAX_PARALLEL_LIMIT:
+            self.max_parallel = max_parallel
+
+        # Размер пула HTTP-соединений
+        http_pool_size = data.get("http_pool_size")
+        if isinstance(http_pool_size, int) and 1 <= http_pool_size <= MAX_PARALLEL_LIMIT:
+            self.http_pool_size = http_pool_size
+
+        # Групповые запросы
+        bulk_urls = data.get("bulk_catalog_urls")
+        if isinstance(bulk_urls, list):
+            self.bulk_catalog_urls = [u for u in bulk_urls if isinstance(u, str) and u]
+        bulk_threshold = data.get("bulk_threshold")
+        if isinstance(bulk_threshold, int) and bulk_threshold >= 1:
+            self.bulk_threshold = bulk_threshold
+
+        # Планировщик свежести
+        freshness_enabled = data.get("freshness_enabled")
+        if isinstance(freshness_enabled, bool):
+            self.freshness_enabled = freshness_enabled
+        max_age_hours = data.get("freshness_max_age_hours")
+        if isinstance(max_age_hours, (int, float)) and max_age_hours > 0:
+            self.freshness.max_age = max_age_hours * 3600
+
+        # Последняя удачная копия при ошибках
+        max_staleness_hours = data.get("max_staleness_hours")
+        if isinstance(max_staleness_hours, (int, float)) and max_staleness_hours >= 0:
+            self.max_staleness = max_staleness_hours * 3600
+
+        # Ограничение частоты запросов
+        rate = data.get("rate_limit_per_second")
+        if isinstance(rate, (int, float)) and rate > 0:
+            self.rate_limiter.rate = float(rate)
+        burst = data.get("rate_limit_burst")
+        if isinstance(burst, int) and burst >= 0:
+            self.rate_limiter.burst = burst
+
+        # Расписания групп (свой интервал автообновления)
+        group_schedules = data.get("group_schedules")
+        if isinstance(group_schedules, list):
+            self.group_schedules = [item for item in group_schedules if isinstance(item, dict)]
+
+        # Метрики для мониторинга
+        metrics_textfile = data.get("metrics_textfile")
+        if isinstance(metrics_textfile, str):
+            self.metrics_textfile = metrics_textfile
+        metrics_port = data.get("metrics_port")
+        if isinstance(metrics_port, int) and 0 <= metrics_port <= 65535:
+            self.metrics_port = metrics_port
+
+        # Архив TLE
+        archive_enabled = data.get("archive_enabled")
+        if isinstance(archive_enabled, bool):
+            self.archive_enabled = archive_enabled
+
+        # Общий кэш нескольких копий программы
+        shared_dir = data.get("shared_cache_dir")
+        if isinstance(shared_dir, str):
+            self.shared_cache = SharedCache(shared_dir) if shared_dir else None
+        shared_age = data.get("shared_cache_max_age_minutes")
+        if self.shared_cache is not None and isinstance(shared_age, (int, float)) and shared_age > 0:
+            self.shared_cache.max_age = shared_age * 60
+
+        # Локальный TLE-сервер
+        tle_server_host = data.get("tle_server_host")
+        if isinstance(tle_server_host, str) and tle_server_host:
+            self.tle_server_host = tle_server_host
+        tle_server_port = data.get("tle_server_port")
+        if isinstance(tle_server_port, int) and 0 <= tle_server_port <= 65535:
+            self.tle_server_port = tle_server_port
+
+        # Дополнительные файлы вывода
+        if "output_profiles" in data:
+            self.output_profiles = parse_output_profiles(data.get("output_profiles"))
+
+        # Спутники
+        satellites_data = data.get("satellites")
+        if isinstance(satellites_data, list):
+            self.store.load_list(item for item in satellites_data if isinstance(item, dict))
+
+        if not len(self.store):
+            self.store.load_list(DEFAULT_SATELLITES)
+
+    def settings_data(self):
+        """Параметры движка и список спутников для записи в файл настроек."""
+        return {
+            "output_filename": self.output_filename,
+            "max_parallel": self.max_parallel,
+            "http_pool_size": self.http_pool_size,
+            "bulk_catalog_urls": self.bulk_catalog_urls,
+            "bulk_threshold": self.bulk_threshold,
+            "freshness_enabled": self.freshness_enabled,
+            "freshness_max_age_hours": self.freshness.max_age / 3600,
+            "max_staleness_hours": self.max_staleness / 3600,
+            "rate_limit_per_second": self.rate_limiter.rate,
+            "rate_limit_burst": self.rate_limiter.burst,
+            "group_schedules": self.group_schedules,
+            "output_profiles": [profile_to_settings(p) for p in self.output_profiles],
+            "metrics_textfile": self.metrics_textfile,
+            "metrics_port": self.metrics_port,
+            "archive_enabled": self.archive_enabled,
+            "shared_cache_dir": self.shared_cache.directory if self.shared_cache else "",
+            "shared_cache_max_age_minutes": (
+                self.shared_cache.max_age / 60 if self.shared_cache else SHARED_CACHE_MAX_AGE / 60
+            ),
+            "tle_server_host": self.tle_server_host,
+            "tle_server_port": self.tle_server_port,
+            "satellites": self.store.to_list(),
+        }
+
+    # ==========================
+    # HTTP-СЕССИЯ
+    # ==========================
+    def create_http_session(self):
+        """Создать общую сессию requests с пулом keep-alive соединений и сжатием."""
+        import requests
+
+        session = requests.Session()
+        adapter = timed_http_adapter_class()(
+            pool_connections=4,
+            pool_maxsize=self.http_pool_size,
+            pool_block=True,  # лишние потоки ждут свободное соединение, а не открывают новое
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({
+            "User-Agent": f"{APP_NAME}/{APP_VERSION}",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        })
+        self.http_session = session
+
+    def get_http_pool_stats(self):
+        """
+        Возвращает (запросов, открыто_соединений) по всем пулам сессии
+        с момента её создания.
+        """
+        num_requests = 0
+        num_connections = 0
+        if self.http_session is None:
+            return num_requests, num_connections
+        seen = set()
+        for adapter in self.http_session.adapters.values():
+            if id(adapter) in seen:
+                continue
+            seen.add(id(adapter))
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                num_requests += pool.num_requests
+                num_connections += pool.num_connections
+        return num_requests, num_connections
+
+    # ==========================
+    # ЗАГРУЗКА TLE
+    # ==========================
+    def request_records(self, url, label=None, timings=None):
+        """
+        Условный GET-запрос через общую сессию (с валидаторами из кэша).
+        Ответ читается потоком и сразу разбирается в записи TLE.
+
+        label и timings — подпись и список, куда добавляется RequestTiming
+        этого запроса (для метрик цикла).
+
+        Возвращает (records, parser): список корректных TleRecord и парсер
+        со счётчиками отклонённых записей. При ошибке HTTP/сети
+        выбрасывает исключение requests (или HostBackoffError).
+        """
+        timing = RequestTiming(label or url, url)
+        _timing_local.timing = timing
+        t0 = time.perf_counter()
+        try:
+            if self.shared_cache is not None:
+                return self._shared_request_records(url, timing)
+            return self._request_records(url, timing)
+        finally:
+            timing.total = time.perf_counter() - t0
+            if timing.status is None:
+                timing.status = "error"
+            _timing_local.timing = None
+            if timings is not None:
+                timings.append(timing)
+
+    def _shared_request_records(self, url, timing):
+        """
+        Запрос через общий кэш: свежая запись берётся без обращения к
+        серверу; иначе URL загружает только одна копия программы, а
+        остальные дожидаются её результата.
+        """
+        cache = self.shared_cache
+        body = cache.fresh(url)
+        if body is None:
+            try:
+                owner = cache.acquire(url)
+            except OSError as e:
+                # Папка недоступна (сетевой диск отключён, нет прав) — цикл
+                # не прерывается, URL загружается напрямую
+                self._shared_cache_unavailable(e)
+                return self._request_records(url, timing)
+            if cache.set_available(True):
+                self.log(f"Общий кэш {cache.directory} снова доступен.")
+            try:
+                # Пока ждали, другая копия могла уже загрузить этот URL
+                body = cache.fresh(url)
+                if body is None and not owner:
+                    # Другая копия всё ещё загружает (её блокировка жива): сервер
+                    # не запрашиваем, берём последнюю запись, даже устаревшую.
+                    # Сами идём на сервер, только если записи нет вовсе
+                    body, age = cache.read(url)
+                    if body is not None:
+                        self.log(f"  ⚠ Общий кэш занят, взята запись {age / 60:.0f} мин назад: {url}")
+                if body is None:
+                    records, parser = self._request_records(url, timing)
+                    if records:
+                        try:
+                            cache.store(url, "\n".join(record_block(r) for r in records) + "\n")
+                        except OSError as e:
+                            self._shared_cache_unavailable(e)
+                    return records, parser
+            finally:
+                if owner:
+                    cache.release(url)
+
+        timing.status = 200
+        timing.cache = CACHE_SHARED
+        parser = TleStreamParser()
+        t0 = time.perf_counter()
+        records = list(parser.records([body]))
+        timing.parse = time.perf_counter() - t0
+        return records, parser
+
+    def _shared_cache_unavailable(self, error):
+        """Сообщить о недоступности общего кэша один раз, а не для каждого URL."""
+        if self.shared_cache.set_available(False):
+            self.log(f"⚠ Общий кэш {self.shared_cache.directory} недоступен, загрузка напрямую: {error}")
+
+    def _request_records(self, url, timing):
+        import requests
+
+        self.rate_limiter.acquire(url)
+
+        headers = self.http_cache.conditional_headers(url)
+        t0 = time.perf_counter()
+        try:
+            resp = self.http_session.get(url, timeout=20, headers=headers, stream=True)
+        except requests.exceptions.Timeout:
+            delay = self.rate_limiter.report_timeout(url)
+            if delay:
+                self.log(f"  ⏸ Серия таймаутов: сервер {urlparse(url).netloc} на паузе {int(delay)} с.")
+            raise
+        # До заголовков ответа, без установки соединения
+        timing.first_byte = max(0.0, time.perf_counter() - t0 - timing.dns - timing.connect - timing.tls)
+        timing.status = resp.status_code
+
+        parser = TleStreamParser()
+        with resp:
+            if resp.status_code in (403, 429) or (resp.status_code == 503 and "Retry-After" in resp.headers):
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                delay = self.rate_limiter.report_rate_limited(url, retry_after)
+                self.log(f"  ⏸ Ответ {resp.status_code}: сервер {urlparse(url).netloc} на паузе {int(delay)} с.")
+            elif resp.status_code < 400:
+                self.rate_limiter.report_success(url)
+
+            if resp.status_code == 304:
+                cached = self.http_cache.not_modified(url)
+                if cached is not None:
+                    timing.cache = CACHE_HIT
+                    t0 = time.perf_counter()
+                    records = list(parser.records([cached]))
+                    timing.parse = time.perf_counter() - t0
+                    return records, parser
+
+            resp.raise_for_status()
+            timing.cache = CACHE_MISS
+
+            def timed_chunks():
+                # Время ожидания сети — body, остальное в цикле разбора — parse
+                chunks = resp.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+                while True:
+                    t = time.perf_counter()
+                    chunk = next(chunks, None)
+                    timing.body += time.perf_counter() - t
+                    if chunk is None:
+                        return
+                    timing.bytes += len(chunk)
+                    yield chunk
+
+            t0 = time.perf_counter()
+            records = list(parser.records(timed_chunks()))
+            timing.parse = max(0.0, time.perf_counter() - t0 - timing.body)
+            # Байты по сети (до распаковки gzip), если urllib3 их считает
+            try:
+                timing.bytes = resp.raw.tell() or timing.bytes
+            except (AttributeError, OSError):
+                pass
+
+        # В кэш кладём уже проверенные записи, а не сырой ответ
+        if records:
+            body = "\n".join(record_block(r) for r in records) + "\n"
+            self.http_cache.store(url, resp.headers, body)
+        return records, parser
+
+    def fetch_tle(self, sat_name, url, timings=None):
+        """
+        Загрузить TLE одного спутника (выполняется в пуле потоков).
+
+        Возвращает:
+            (clean_text или None, отклонено_записей)
+        """
+        import requests
+
+        self.log(f"Получение данных для: {sat_name}")
+
+        try:
+            records, parser = self.request_records(url, sat_name, timings)
+            if parser.rejected:
+                self.log(f"  ⚠ {sat_name}: отклонено некорректных записей: {parser.rejected} ({parser.summary()}).")
+
+            if not records:
+                self.log(f"  ⚠ Нет корректных TLE в ответе сервера для {sat_name}.")
+                return None, parser.rejected
+
+            clean_text = "\n".join(record_block(r) for r in records)
+
+            self.log(f"  ✔ {sat_name}: получено {len(clean_text)} символов, записей TLE: {len(records)}.")
+            return clean_text, parser.rejected
+
+        except (requests.exceptions.ConnectTimeout,
+                requests.exceptions.ReadTimeout,
+                requests.exceptions.Timeout) as e:
+            self.log(f"  ✖ Таймаут при получении {sat_name}: {e}")
+            return None, 0
+
+        except (requests.exceptions.RequestException, HostBackoffError) as e:
+            self.log(f"  ✖ Ошибка при получении {sat_name}: {e}")
+            return None, 0
+
+    def plan_requests(self, tasks, pending):
+        """
+        Разделить задачи (записи SatRecord) с индексами из pending на
+        групповые и одиночные.
+
+        Возвращает:
+            (bulk, single): bulk — {индекс задачи: catnr} для CATNR-ссылок,
+            которые можно взять из группового каталога; single — индексы
+            задач, которые качаются отдельным запросом.
+        """
+        bulk = {}
+        single = []
+        for idx in pending:
+            rec = tasks[idx]
+            catnr = parse_catnr_url(rec.url)
+            if catnr and any(same_host(rec.url, cat_url) for cat_url in self.bulk_catalog_urls):
+                bulk[idx] = catnr
+            else:
+                single.append(idx)
+
+        if len(bulk) < self.bulk_threshold:
+            return {}, list(pending)
+        return bulk, single
+
+    def get_bulk_catalog(self, timings=None):
+        """
+        Вернуть групповой каталог {catnr: TLE-блок}, скачав его, если
+        копия в памяти старше BULK_CATALOG_TTL.
+
+        Возвращает:
+            (catalog, had_403_or_timeout, отклонено_записей)
+        """
+        import requests
+
+        if self.bulk_catalog and time.time() - self.bulk_catalog_time < BULK_CATALOG_TTL:
+            self.log(f"Групповой каталог: используется копия в памяти ({len(self.bulk_catalog)} объектов).")
+            return self.bulk_catalog, False, 0
+
+        catalog = {}
+        had_403_or_timeout = False
+        rejected_total = 0
+        for cat_url in self.bulk_catalog_urls:
+            self.log(f"Групповой запрос: {cat_url}")
+            try:
+                records, parser = self.request_records(cat_url, "групповой каталог", timings)
+                for record in records:
+                    catalog[record.catnr] = record_block(record)
+                rejected_total += parser.rejected
+                self.log(f"  ✔ Получено объектов из каталога: {len(records)}")
+                if parser.rejected:
+                    self.log(f"  ⚠ Отклонено некорректных записей: {parser.rejected} ({parser.summary()}).")
+            except (requests.exceptions.ConnectTimeout,
+                    requests.exceptions.ReadTimeout,
+                    requests.exceptions.Timeout) as e:
+                had_403_or_timeout = True
+                self.log(f"  ✖ Таймаут группового запроса: {e}")
+            except (requests.exceptions.RequestException, HostBackoffError) as e:
+                if is_http_403(e):
+                    had_403_or_timeout = True
+                self.log(f"  ✖ Ошибка группового запроса: {e}")
+
+        # Неполный каталог не кэшируем, чтобы в следующий раз попробовать снова
+        if catalog and not had_403_or_timeout:
+            self.bulk_catalog = catalog
+            self.bulk_catalog_time = time.time()
+        return catalog, had_403_or_timeout, rejected_total
+
+    def fetch_group_entries(self, group):
+        """
+        Скачать группу Celestrak (например, "starlink") и вернуть список
+        (name, catnr) её спутников. Ошибки сети пробрасываются.
+        """
+        self.log(f"Импорт группы Celestrak: {group}")
+        if self.http_session is None:
+            self.create_http_session()
+        records, parser = self.request_records(group_url(group))
+        if parser.rejected:
+            self.log(f"  ⚠ Отклонено некорректных записей: {parser.rejected} ({parser.summary()}).")
+        return [(record.name, record.catnr) for record in records]
+
+    def import_satellites(self, entries, group=None):
+        """
+        Добавить спутники (name, catnr) в список одной пачкой.
+
+        Возвращает:
+            (добавленные названия, пропущено_повторов)
+        """
+        added, duplicates = self.store.add_many(entries, group)
+        self.log(f"Импорт: добавлено {len(added)}, пропущено повторов {duplicates}.")
+        return added, duplicates
+
+    def profile_names(self, profile, selected_sats):
+        """Спутники профиля вывода (без профиля — основной выбор)."""
+        if not profile.satellites and not profile.groups:
+            return list(selected_sats)
+        names = [name for name in profile.satellites if self.store.get(name) is not None]
+        if profile.groups:
+            groups = set(profile.groups)
+            listed = set(names)
+            names.extend(
+                rec.name for rec in self.store
+                if rec.group_name() in groups and rec.name not in listed
+            )
+        return names
+
+    def output_unchanged(self, path, names, fmt, changes):
+        """
+        Файл вывода уже содержит эту выборку, ни один её спутник не
+        изменился, и файл не трогали после записи (размер и mtime те же).
+        Удалённый или изменённый вручную файл будет сверен и восстановлен.
+        """
+        state = self.output_state.get(path)
+        if changes is None or state is None or state[:2] != (tuple(names), fmt):
+            return False
+        if not changes.dirty.isdisjoint(names):
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return state[2:] == (st.st_size, st.st_mtime_ns)
+
+    def remember_output(self, path, names, fmt):
+        """Запомнить выборку, которая сейчас лежит в файле вывода."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.output_state.pop(path, None)
+            return
+        self.output_state[path] = (tuple(names), fmt, st.st_size, st.st_mtime_ns)
+
+    def write_profiles(self, selected_sats, changes=None):
+        """Записать дополнительные файлы вывода из уже полученных данных."""
+        for profile in self.output_profiles:
+            names = self.profile_names(profile, selected_sats)
+            if self.output_unchanged(profile.path, names, profile.format, changes):
+                continue
+            blocks = []
+            for name in names:
+                rec = self.store.get(name)
+                if rec is not None and rec.block and rec.status != STATUS_FAILED:
+                    blocks.append(rec.block)
+            if not blocks:
+                self.log(f"Профиль «{profile.name}»: нет данных, файл {profile.path} не записан.")
+                continue
+            try:
+                text = render_output(blocks, profile.format)
+                if write_if_changed(profile.path, text):
+                    self.log(f"Профиль «{profile.name}»: записано {len(blocks)} спутников в {profile.path} ({profile.format}).")
+                self.remember_output(profile.path, names, profile.format)
+            except (OSError, ValueError) as e:
+                self.output_state.pop(profile.path, None)
+                self.log(f"✖ Профиль «{profile.name}»: ошибка записи {profile.path}: {e}")
+
+    def compare_cycle(self, tasks, previous):
+        """
+        Отчёт об изменениях цикла: tasks — записи SatRecord после загрузки,
+        previous — их (блок, статус) до неё.
+        """
+        changes = ChangeReport()
+        for rec, (old_block, old_status) in zip(tasks, previous):
+            if rec.status == STATUS_FRESH:
+                changes.add(rec.name, old_block, rec.block)
+            elif rec.status in (STATUS_CACHED, STATUS_FAILED):
+                changes.add_stale(rec.name)
+            else:
+                changes.add_unchanged(rec.name)
+            # Спутник появился в файлах вывода или пропал из них
+            was_listed = bool(old_block) and old_status != STATUS_FAILED
+            if was_listed != (bool(rec.block) and rec.status != STATUS_FAILED):
+                changes.dirty.add(rec.name)
+
+        self.log(f"Изменения: {changes.summary()}.")
+        for name, hints in changes.maneuvers:
+            self.log(f"  ⚑ {name}: возможен манёвр ({', '.join(hints)}).")
+        return changes
+
+    def export_metrics(self):
+        """Выгрузить метрики: файл для node_exporter и/или HTTP /metrics."""
+        if self.metrics_port and self.metrics_server is None:
+            try:
+                self.metrics_server = MetricsHttpServer(self.metrics, self.metrics_port)
+                self.log(f"Метрики: http://127.0.0.1:{self.metrics_port}/metrics")
+            except OSError as e:
+                self.log(f"⚠ Не удалось открыть порт метрик {self.metrics_port}: {e}")
+                self.metrics_port = 0
+        if self.metrics_textfile:
+            try:
+                atomic_write(self.metrics_textfile, self.metrics.prometheus_text().encode("utf-8"))
+            except OSError as e:
+                self.log(f"⚠ Не удалось записать метрики в {self.metrics_textfile}: {e}")
+
+    def report_progress(self, done, total):
+        if self.progress is not None:
+            self.progress(done, total)
+
+    def download_tles(self, selected_sats, is_manual: bool, due_names=None):
+        """
+        Загружает TLE выбранных спутников параллельно (не более
+        self.max_parallel запросов одновременно) и записывает их в файл
+        в порядке выбора.
+
+        due_names — если задано, запрашиваются только эти спутники (чьё
+        расписание подошло); остальные идут в файл из последних данных.
+
+        Возвращает DownloadResult:
+            cooldown: 0 или оставшаяся пауза, если все серверы цикла на паузе
+                после 403/429/серии таймаутов (только для автоцикла);
+            status: RESULT_WRITTEN / RESULT_UNCHANGED / RESULT_WRITE_ERROR / RESULT_NO_DATA;
+            error: текст ошибки записи или None;
+            metrics: CycleMetrics цикла (также добавляются в self.metrics);
+            changes: ChangeReport — сравнение с данными прошлого цикла.
+        """
+        metrics = CycleMetrics(time.time())
+        t0 = time.perf_counter()
+        result = self._download_tles(selected_sats, is_manual, due_names, metrics, t0)
+        metrics.duration = time.perf_counter() - t0
+        metrics.status = result.status
+        self.metrics.add_cycle(metrics)
+        self.export_metrics()
+        return result._replace(metrics=metrics)
+
+    def _download_tles(self, selected_sats, is_manual, due_names, metrics, t0):
+        cooldown_seconds = 0
+        # Запас токенов по умолчанию — по числу параллельных запросов
+        self.rate_limiter.parallel = self.max_parallel
+        if self.http_session is None:
+            self.create_http_session()
+        requests_before, connections_before = self.get_http_pool_stats()
+        hits_before, misses_before = self.http_cache.stats()
+        shared_before = self.shared_cache.stats() if self.shared_cache is not None else None
+
+        tasks = []
+        for sat_name in selected_sats:
+            rec = self.store.get(sat_name)
+            if rec is None:
+                self.log(f"URL для {sat_name} не найден.")
+                continue
+            tasks.append(rec)
+        main_count = len(tasks)
+
+        # Спутники профилей вывода загружаются тем же циклом, один раз
+        queued = {rec.name for rec in tasks}
+        for profile in self.output_profiles:
+            for sat_name in self.profile_names(profile, selected_sats):
+                if sat_name not in queued:
+                    queued.add(sat_name)
+                    tasks.append(self.store.get(sat_name))
+
+        # Данные прошлого цикла — для отчёта об изменениях
+        previous = [(rec.block, rec.status) for rec in tasks]
+
+        # Результаты раскладываем по индексу, чтобы сохранить порядок выбора
+        results = [None] * len(tasks)
+
+        # В автоцикле пропускаем спутники, у которых новых элементов ещё
+        # не может быть; ручное обновление запрашивает всё
+        now = time.time()
+        pending = []
+        off_schedule = 0
+        for idx, rec in enumerate(tasks):
+            if due_names is not None and rec.name not in due_names and rec.block is not None:
+                rec.status = STATUS_SKIPPED
+                off_schedule += 1
+                self.log(f"  ↺ {rec.name}: [cached] не по расписанию этого цикла.")
+            elif self.freshness_enabled and not is_manual and not self.freshness.is_due(rec, now):
+                rec.status = STATUS_SKIPPED
+                self.log(f"  ↺ {rec.name}: [cached] данные ещё свежие, запрос не нужен.")
+            else:
+                pending.append(idx)
+        if off_schedule:
+            self.log(f"Расписание: {off_schedule} спутников обновляются по своему расписанию, сейчас не запрашиваются.")
+        skipped = len(tasks) - len(pending)
+        if skipped - off_schedule:
+            self.log(
+                f"Планировщик: пропущено {skipped - off_schedule} из {len(tasks)} спутников "
+                f"(данные ещё свежие)."
+            )
+
+        rejected_count = 0
+        done = 0
+        self.report_progress(done, len(pending))
+        bulk, single = self.plan_requests(tasks, pending)
+        if bulk:
+            catalog, flagged, rejected = self.get_bulk_catalog(metrics.requests)
+            rejected_count += rejected
+            found = 0
+            for idx, catnr in bulk.items():
+                block = catalog.get(catnr)
+                if block:
+                    results[idx] = block
+                    found += 1
+                    self.log(f"  ✔ {tasks[idx].name}: взят из группового каталога.")
+                elif not flagged:
+                    # Нет в каталоге (например, неактивный объект) — качаем отдельно.
+                    # После 403/таймаута на каталоге сервер лишний раз не дёргаем.
+                    single.append(idx)
+            single.sort()
+            done += found
+            self.report_progress(done, len(pending))
+            self.log(f"Из группового каталога взято {found} из {len(bulk)} спутников.")
+
+        if single:
+            workers = min(self.max_parallel, len(single))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tle") as pool:
+                futures = {
+                    pool.submit(self.fetch_tle, tasks[idx].name, tasks[idx].url, metrics.requests): idx
+                    for idx in single
+                }
+                for fut in as_completed(futures):
+                    results[futures[fut]], rejected = fut.result()
+                    rejected_count += rejected
+                    done += 1
+                    self.report_progress(done, len(pending))
+
+        # Удачные ответы запоминаем; для неудачных берём последнюю удачную
+        # копию, чтобы спутник не пропадал из файла из-за одного сбоя
+        now = time.time()
+        fresh_count = 0
+        fallback_count = 0
+        for idx in pending:
+            rec = tasks[idx]
+            if results[idx]:
+                self.freshness.update(rec, results[idx], now)
+                rec.status = STATUS_FRESH
+                fresh_count += 1
+                self.log(f"  ● {rec.name}: [fresh] получен в этом цикле.")
+                continue
+
+            age = self.freshness.fallback_age(rec, now, self.max_staleness)
+            if age is None:
+                rec.status = STATUS_FAILED
+                self.log(f"  ✖ {rec.name}: нет данных и нет пригодной сохранённой копии.")
+                continue
+            rec.status = STATUS_CACHED
+            fallback_count += 1
+            self.log(f"  ↺ {rec.name}: [cached] последняя удачная копия ({age / 3600:.1f} ч назад).")
+        metrics.fetch = time.perf_counter() - t0
+        for rec in tasks:
+            metrics.satellites[rec.status] = metrics.satellites.get(rec.status, 0) + 1
+
+        changes = self.compare_cycle(tasks, previous)
+        metrics.changes = changes.counts()
+
+        try:
+            self.store.save_state(self.state_file)
+        except OSError as e:
+            self.log(f"⚠ Не удалось сохранить состояние спутников: {e}")
+
+        self.log(
+            f"Источники записей: [fresh] {fresh_count}, [cached] {fallback_count + skipped} "
+            f"(после ошибки {fallback_count}, планировщик {skipped})."
+        )
+
+        if rejected_count:
+            self.log(f"Проверка TLE: отклонено некорректных записей за цикл: {rejected_count}.")
+
+        # Клиентам TLE-сервера — все спутники цикла (включая профили);
+        # версия меняется только при новых данных
+        changed = self.tle_feed.publish(tasks)
+        if changed and self.tle_server is not None:
+            self.log(f"Сервер TLE: изменилось {len(changed)} спутников, версия {self.tle_feed.version}.")
+
+        # Файл собирается из записей хранилища в порядке выбора
+        main_names = [rec.name for rec in tasks[:main_count]]
+        blocks = [rec.block for rec in tasks[:main_count] if rec.status != STATUS_FAILED and rec.block]
+
+        requests_after, connections_after = self.get_http_pool_stats()
+        cycle_requests = requests_after - requests_before
+        cycle_opened = connections_after - connections_before
+        self.log(
+            f"HTTP: запросов {cycle_requests}, новых соединений {cycle_opened}, "
+            f"переиспользовано {max(0, cycle_requests - cycle_opened)}."
+        )
+
+        hits_after, misses_after = self.http_cache.stats()
+        self.log(
+            f"Кэш: не изменилось (304) {hits_after - hits_before}, "
+            f"загружено полностью {misses_after - misses_before}."
+        )
+        if self.shared_cache is not None:
+            shared_after = self.shared_cache.stats()
+            shared_hits, shared_fetches, shared_waits = (a - b for a, b in zip(shared_after, shared_before))
+            self.log(
+                f"Общий кэш: взято {shared_hits}, загружено с сервера {shared_fetches}, "
+                f"ожиданий другой копии {shared_waits}."
+            )
+        try:
+            self.http_cache.save()
+        except OSError as e:
+            self.log(f"⚠ Не удалось сохранить кэш ответов: {e}")
+
+        # Пауза всего цикла — только если на паузе все серверы этого цикла
+        if not is_manual:
+            cooldown_seconds = int(self.rate_limiter.backoff_remaining(rec.url for rec in tasks))
+            if cooldown_seconds > 0:
+                self.log(f"Сервер ограничил запросы. Следующая попытка через {format_duration(cooldown_seconds)}.")
+
+        t_write = time.perf_counter()
+        try:
+            self.write_profiles(selected_sats, changes)
+
+            # Новые наборы элементов — в архив; повторы по эпохе отбрасываются
+            # без обращения к диску
+            if self.archive_enabled and fresh_count:
+                try:
+                    added = self.archive.append(
+                        results[idx] for idx in pending if tasks[idx].status == STATUS_FRESH
+                    )
+                    if added:
+                        self.log(f"Архив: добавлено новых TLE: {added}.")
+                except (OSError, zlib.error) as e:
+                    self.log(f"⚠ Не удалось дописать архив TLE: {e}")
+
+            if not blocks:
+                self.log("Не удалось получить данные ни для одного спутника.")
+                return DownloadResult(cooldown_seconds, RESULT_NO_DATA, None, changes=changes)
+
+            # Без изменений выборки файл не собирается и не сравнивается с диском
+            path = self.output_filename
+            if self.output_unchanged(path, main_names, FORMAT_TLE3, changes):
+                self.log(f"Данные не изменились, файл {path} не перезаписан.")
+                return DownloadResult(cooldown_seconds, RESULT_UNCHANGED, None, changes=changes)
+
+            try:
+                final_text = "\n".join(blocks) + "\n"
+                written = write_if_changed(path, final_text)
+                self.remember_output(path, main_names, FORMAT_TLE3)
+                if written:
+                    self.log(f"Данные записаны в файл {path}")
+                    return DownloadResult(cooldown_seconds, RESULT_WRITTEN, None, changes=changes)
+                self.log(f"Данные не изменились, файл {path} не перезаписан.")
+                return DownloadResult(cooldown_seconds, RESULT_UNCHANGED, None, changes=changes)
+            except OSError as e:
+                self.output_state.pop(path, None)
+                self.log(f"✖ Ошибка записи файла {path}: {e}")
+                return DownloadResult(cooldown_seconds, RESULT_WRITE_ERROR, str(e), changes=changes)
+        finally:
+            metrics.write = time.perf_counter() - t_write
@@ -0,0 +1,1341 @@
+"""
+Графический интерфейс nuUpdater (Tkinter). Вся работа с сетью и файлами —
+в nuCore.TleEngine.
+"""
+import tkinter as tk
+from tkinter import messagebox, scrolledtext, ttk, filedialog, simpledialog
+from tkinter import font as tkfont
+import threading
+import queue
+import time
+import os
+from collections import namedtuple
+from itertools import count
+
+from nuCore import (
+    APP_NAME,
+    APP_VERSION,
+    SETTINGS_FILE,
+    MAX_PARALLEL_LIMIT,
+    INTERVAL_UNITS,
+    RESULT_WRITTEN,
+    RESULT_UNCHANGED,
+    RESULT_WRITE_ERROR,
+    RESULT_ERROR,
+    DownloadResult,
+    HostBackoffError,
+    TleEngine,
+    group_url,
+    import_entries_from_csv,
+    import_entries_from_tle,
+    SETTINGS_SAVE_DELAY,
+    SettingsFile,
+    open_log_file,
+    SCHEDULE_WAKE_MAX,
+    CACHE_HIT,
+    CACHE_MISS,
+    CACHE_SHARED,
+    REQUEST_PHASES,
+    build_scheduler,
+    parse_group_schedules,
+    interval_to_seconds,
+    format_duration,
+)
+
+ALL_GROUPS = "Все"
+
+# События от рабочих потоков копятся в очереди и разбираются в потоке Tk
+# раз в EVENT_PUMP_MS, пока идут фоновые задачи (в простое окно не
+# просыпается); в окне лога остаются последние LOG_MAX_LINES строк
+# (полный лог — в файле)
+EVENT_PUMP_MS = 100
+LOG_MAX_LINES = 2000
+
+# ==========================
+# СОБЫТИЯ РАБОЧИХ ПОТОКОВ
+# ==========================
+# Рабочие потоки не трогают Tk и состояние окна: они только кладут эти
+# события в очередь, а NuUpdaterApp.pump_events применяет их в потоке Tk.
+LogEvent = namedtuple("LogEvent", "text")
+ProgressEvent = namedtuple("ProgressEvent", "done total")
+DownloadDone = namedtuple("DownloadDone", "job is_manual result")
+ImportDone = namedtuple("ImportDone", "job finish entries error")
+
+JOB_DOWNLOAD = "download"
+JOB_IMPORT = "import"
+
+
+# ==========================
+# СПИСОК СПУТНИКОВ
+# ==========================
+class SatelliteList(tk.Frame):
+    """
+    Список спутников с флажками для тысяч записей. Рисуются только видимые
+    строки на Canvas, поэтому перестройка не зависит от размера каталога.
+    Выбор хранится в множестве названий self.selected.
+    """
+
+    ROW_PAD = 4
+    FILTER_DELAY_MS = 150
+
+    def __init__(self, master, store, on_change=None, height=8):
+        super().__init__(master)
+        self.store = store
+        self.on_change = on_change
+        self.selected = set()
+        self.view = []          # записи SatRecord, прошедшие фильтр
+        self.query = ""
+        self.group = ""
+        self.filter_job = None
+        self.redraw_job = None
+
+        self.font = tkfont.nametofont("TkDefaultFont")
+        self.row_height = self.font.metrics("linespace") + self.ROW_PAD
+
+        # ---- Поиск и группа ----
+        filter_frame = tk.Frame(self)
+        filter_frame.pack(fill=tk.X, pady=(0, 5))
+
+        tk.Label(filter_frame, text="Поиск:").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", lambda *_: self.schedule_filter())
+        tk.Entry(filter_frame, textvariable=self.search_var, width=16).pack(side=tk.LEFT, padx=(5, 10))
+
+        tk.Label(filter_frame, text="Группа:").pack(side=tk.LEFT)
+        self.group_var = tk.StringVar(value=ALL_GROUPS)
+        self.combo_group = ttk.Combobox(filter_frame, textvariable=self.group_var, state="readonly", width=14)
+        self.combo_group.pack(side=tk.LEFT, padx=(5, 0), fill=tk.X, expand=True)
+        self.combo_group.bind("<<ComboboxSelected>>", lambda e: self.apply_filter())
+
+        # ---- Строки ----
+        rows_frame = tk.Frame(self)
+        rows_frame.pack(fill=tk.BOTH, expand=True)
+
+        self.canvas = tk.Canvas(
+            rows_frame, height=height * self.row_height, highlightthickness=1,
+            highlightbackground="gray", background="white"
+        )
+        self.scroll = tk.Scrollbar(rows_frame, command=self.canvas.yview)
+        self.canvas.config(yscrollcommand=self.on_scroll)
+        self.scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.canvas.bind("<Configure>", lambda e: self.schedule_redraw())
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<MouseWheel>", self.on_wheel)
+        self.canvas.bind("<Button-4>", lambda e: self.canvas.yview_scroll(-3, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.canvas.yview_scroll(3, "units"))
+
+        self.lbl_count = tk.Label(self, text="", fg="gray")
+        self.lbl_count.pack(anchor="w")
+
+    # ---- данные ----
+    def refresh(self):
+        """Перечитать хранилище (после изменения списка спутников)."""
+        self.selected &= set(self.store.names())
+        groups = self.store.groups()
+        self.combo_group.config(values=[ALL_GROUPS] + groups)
+        if self.group_var.get() not in groups:
+            self.group_var.set(ALL_GROUPS)
+        self.apply_filter(full=True)
+
+    def selected_names(self):
+        """Выбранные спутники в порядке списка."""
+        return [name for name in self.store.names() if name in self.selected]
+
+    def set_selected(self, names):
+        self.selected = set(names) & set(self.store.names())
+        self.schedule_redraw()
+
+    def set_view_selected(self, value: bool):
+        """Выбрать/снять все спутники, прошедшие текущий фильтр."""
+        names = {rec.name for rec in self.view}
+        if value:
+            self.selected |= names
+        else:
+            self.selected -= names
+        self.schedule_redraw()
+        if self.on_change:
+            self.on_change()
+
+    # ---- фильтр ----
+    def schedule_filter(self):
+        if self.filter_job is not None:
+            self.after_cancel(self.filter_job)
+        self.filter_job = self.after(self.FILTER_DELAY_MS, self.apply_filter)
+
+    def apply_filter(self, full=False):
+        self.filter_job = None
+        query = self.search_var.get().strip().lower()
+        group = self.group_var.get()
+        group = "" if group == ALL_GROUPS else group
+
+        # Запрос уточнился — достаточно отфильтровать текущий результат
+        if not full and group == self.group and self.query and query.startswith(self.query):
+            source = self.view
+        else:
+            source = iter(self.store)
+
+        def matches(rec):
+            if group and rec.group_name() != group:
+                return False
+            if not query:
+                return True
+            return query in rec.name.lower() or (rec.catnr is not None and rec.catnr.startswith(query))
+
+        self.view = [rec for rec in source if matches(rec)]
+        self.query = query
+        self.group = group
+
+        self.canvas.config(scrollregion=(0, 0, 0, len(self.view) * self.row_height))
+        self.canvas.yview_moveto(0)
+        self.schedule_redraw()
+
+    # ---- отрисовка ----
+    def on_scroll(self, first, last):
+        self.scroll.set(first, last)
+        self.schedule_redraw()
+
+    def schedule_redraw(self):
+        if self.redraw_job is None:
+            self.redraw_job = self.after_idle(self.redraw)
+
+    def redraw(self):
+        self.redraw_job = None
+        self.canvas.delete("row")
+
+        top = int(self.canvas.canvasy(0))
+        height = self.canvas.winfo_height()
+        first = max(0, top // self.row_height)
+        last = min(len(self.view), (top + height) // self.row_height + 1)
+        box = self.row_height - 2 * self.ROW_PAD
+
+        for idx in range(first, last):
+            rec = self.view[idx]
+            y = idx * self.row_height
+            x = 6
+            by = y + self.ROW_PAD
+            self.canvas.create_rectangle(x, by, x + box, by + box, outline="black", tags="row")
+            if rec.name in self.selected:
+                self.canvas.create_text(x + box / 2, by + box / 2, text="✔", font=self.font, tags="row")
+            label = rec.name if rec.catnr is None else f"{rec.name}  ({rec.catnr})"
+            self.canvas.create_text(x + box + 6, y + self.row_height / 2, text=label,
+                                    anchor="w", font=self.font, tags="row")
+
+        self.lbl_count.config(text=f"Показано {len(self.view)} из {len(self.store)}, выбрано {len(self.selected)}")
+
+    # ---- мышь ----
+    def on_click(self, event):
+        # На Windows колесо мыши приходит виджету с фокусом. Фокус берём по
+        # щелчку, а не при наведении, чтобы не отнимать его у поля поиска
+        self.canvas.focus_set()
+        idx = int(self.canvas.canvasy(event.y)) // self.row_height
+        if not 0 <= idx < len(self.view):
+            return
+        name = self.view[idx].name
+        if name in self.selected:
+            self.selected.discard(name)
+        else:
+            self.selected.add(name)
+        self.schedule_redraw()
+        if self.on_change:
+            self.on_change()
+
+    def on_wheel(self, event):
+        self.canvas.yview_scroll(-1 if event.delta > 0 else 1, "units")
+
+
+class NuUpdaterApp(tk.Tk):
+    def __init__(self, startup_t0=None):
+        super().__init__()
+
+        # Отсчёт времени запуска (для замера «до готовности интерфейса»)
+        self.startup_t0 = startup_t0 if startup_t0 is not None else time.perf_counter()
+
+        # Главное окно прячем, пока идёт инициализация; вместо него — сплэш
+        self.withdraw()
+        splash = show_splash(self)
+
+        # Настройки и кэши читаем в фоне, пока строится окно
+        loaded = {}
+
+        def load_in_background():
+            loaded["settings"] = self.settings_file.load()
+            self.engine.open()
+
+        # ---- ОКНО ----
+        # Пытаемся установить иконку nuUpdater.ico из той же папки, где лежит скрипт/exe
+        try:
+            base_dir = os.path.dirname(os.path.abspath(__file__))
+            icon_path = os.path.join(base_dir, "nuUpdater.ico")
+            if os.path.exists(icon_path):
+                self.iconbitmap(icon_path)
+        except Exception:
+            pass
+
+        self.title(f"{APP_NAME} v{APP_VERSION} by MioRio")
+        self.geometry("450x760")
+        self.minsize(420, 600)
+
+        # Состояния
+        # Работающие фоновые задачи: {номер: JOB_DOWNLOAD / JOB_IMPORT};
+        # меняется только в потоке Tk
+        self.jobs = {}
+        self.job_ids = count(1)
+        self.job_started = {}   # {номер: time.perf_counter() запуска}
+        self.auto_running = False
+        self.scheduler = None   # Scheduler, пока включено автообновление
+        self.timer_job = None
+
+        # Настройки пишутся не чаще раза в SETTINGS_SAVE_DELAY
+        self.settings_file = SettingsFile(SETTINGS_FILE)
+        self.settings_job = None
+        self.settings_error = None
+
+        # Очередь событий из любых потоков + файл лога с ротацией
+        self.events = queue.SimpleQueue()
+        self.pump_job = None
+        self.event_handlers = {
+            ProgressEvent: self.on_progress,
+            DownloadDone: self.on_download_done,
+            ImportDone: self.on_import_done,
+        }
+        self.log_file = open_log_file()
+        self.log_lines = 0
+
+        # Загрузка, разбор и запись TLE; сообщения и ход загрузки идут
+        # через очередь событий
+        self.engine = TleEngine(
+            log=self.log,
+            progress=lambda done, total: self.events.put(ProgressEvent(done, total))
+        )
+
+        # Настройки для инициализации GUI
+        self.interval_value_setting = None
+        self.interval_unit_setting = None
+        self.selected_sats_setting = None
+        self.skip_file_dialog = False
+
+        loader = threading.Thread(target=load_in_background, daemon=True)
+        loader.start()
+
+        # Собираем GUI (кроме списка спутников — он зависит от настроек)
+        self.create_widgets()
+
+        # Меню "Справка → О программе"
+        self.create_menubar()
+
+        self.pump_events()
+
+        # Дожидаемся настроек (включая спутники) и применяем их
+        loader.join()
+        self.load_settings(loaded.get("settings", {}))
+        self.build_sat_checkbuttons()
+        self.apply_settings_to_gui()
+        self.engine.start_servers(self.sat_list.selected_names())
+
+        splash.destroy()
+
+        # Если файл вывода не выбран/не найден — спросить
+        if not self.skip_file_dialog:
+            self.choose_output_file_on_start()
+            self.apply_settings_to_gui()
+
+        self.deiconify()
+        self.protocol("WM_DELETE_WINDOW", self.on_app_close)
+        self.bind("<Map>", self.on_map)
+
+        if self.settings_file.recovered:
+            self.log(
+                f"⚠ Файл настроек повреждён ({self.settings_file.load_error}), "
+                f"настройки восстановлены из резервной копии."
+            )
+        elif self.settings_file.load_error:
+            self.log(
+                f"⚠ Файл настроек повреждён ({self.settings_file.load_error}), "
+                f"резервной копии нет — используются настройки по умолчанию."
+            )
+
+        # Сохраняем настройки (на случай нового пути к файлу)
+        self.save_settings()
+
+        # Время до готовности: первый простой цикла событий после показа окна
+        self.after_idle(self.log_startup_time)
+
+    def log_startup_time(self):
+        elapsed_ms = (time.perf_counter() - self.startup_t0) * 1000
+        self.log(f"Интерфейс готов за {elapsed_ms:.0f} мс.")
+
+    # ==========================
+    # МЕНЮ
+    # ==========================
+    def create_menubar(self):
+        menubar = tk.Menu(self)
+
+        # Меню "Справка"
+        helpmenu = tk.Menu(menubar, tearoff=0)
+        helpmenu.add_command(label="О программе", command=self.show_about)
+
+        menubar.add_cascade(label="Справка", menu=helpmenu)
+
+        self.config(menu=menubar)
+
+    def show_about(self):
+        text = (
+            f"{APP_NAME} v{APP_VERSION}\n\n by MioRio. 2025\n"
+            "Программа обновляет TLE-данные спутников с сайта Celestrak\n"
+            "и сохраняет их в выбранный файл (обычно nu.txt).\n\n"
+            f"Файл настроек:\n{SETTINGS_FILE}"
+        )
+        messagebox.showinfo("О программе", text)
+
+    # ==========================
+    # ЗАГРУЗКА/СОХРАНЕНИЕ НАСТРОЕК
+    # ==========================
+    def load_settings(self, data):
+        """Применить настройки, прочитанные из SETTINGS_FILE."""
+        # Параметры загрузки и список спутников
+        self.engine.apply_settings(data)
+
+        # Файл вывода
+        out = data.get("output_filename")
+        if out and isinstance(out, str) and os.path.exists(out):
+            self.engine.output_filename = out
+            self.skip_file_dialog = True
+
+        # Интервал
+        interval_value = data.get("interval_value")
+        interval_unit = data.get("interval_unit")
+        if isinstance(interval_value, (int, float, str)):
+            self.interval_value_setting = str(interval_value)
+        if interval_unit in INTERVAL_UNITS:
+            self.interval_unit_setting = interval_unit
+
+        # Выбранные спутники
+        selected_sats = data.get("selected_sats")
+        if isinstance(selected_sats, list):
+            self.selected_sats_setting = set(selected_sats)
+
+    def save_settings(self):
+        """
+        Отметить настройки изменёнными. Сама запись в SETTINGS_FILE
+        (Documents\\nuUpdater) выполняется через SETTINGS_SAVE_DELAY, так что
+        серия изменений даёт одну запись.
+        """
+        self.settings_file.mark_dirty()
+        if self.settings_job is None:
+            self.settings_job = self.after(int(SETTINGS_SAVE_DELAY * 1000), self.flush_settings)
+
+    def flush_settings(self):
+        """Записать настройки сейчас, если они изменились."""
+        if self.settings_job is not None:
+            self.after_cancel(self.settings_job)
+            self.settings_job = None
+        if not self.settings_file.dirty:
+            return
+
+        selected_sats = []
+        if hasattr(self, "sat_list"):
+            selected_sats = self.sat_list.selected_names()
+
+        data = self.engine.settings_data()
+        data.update({
+            "interval_value": self.entry_interval.get() if hasattr(self, "entry_interval") else "",
+            "interval_unit": self.interval_unit.get() if hasattr(self, "interval_unit") else "минут",
+            "selected_sats": selected_sats,
+        })
+        try:
+            self.settings_file.save(data)
+        except OSError as e:
+            # Одну и ту же ошибку в лог не повторяем
+            if str(e) != self.settings_error:
+                self.log(f"⚠ Не удалось сохранить настройки: {e}")
+            self.settings_error = str(e)
+            return
+        self.settings_error = None
+
+    def on_app_close(self):
+        # Поле интервала могло измениться без отдельного действия
+        self.settings_file.mark_dirty()
+        self.flush_settings()
+        self.engine.close()
+        self.destroy()
+
+    # ==========================
+    # ВЫБОР ФАЙЛА ПРИ ЗАПУСКЕ
+    # ==========================
+    def choose_output_file_on_start(self):
+        """При запуске спрашиваем файл nu.txt (с возможностью создать)."""
+        while True:
+            path = filedialog.asksaveasfilename(
+                parent=self,
+                title="Выберите файл nu.txt",
+                initialfile="nu.txt",
+                defaultextension=".txt",
+                filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
+            )
+
+            if not path:
+                use_default = messagebox.askyesno(
+                    "Файл по умолчанию",
+                    "Файл не выбран.\nИспользовать nu.txt в папке программы?"
+                )
+                if use_default:
+                    path = "nu.txt"
+                else:
+                    continue
+
+            if os.path.exists(path):
+                self.engine.output_filename = path
+                break
+            else:
+                create = messagebox.askyesno(
+                    "Файл не найден",
+                    f"Файл:\n{path}\nне существует.\n\nСоздать его?"
+                )
+                if create:
+                    try:
+                        with open(path, "w", encoding="utf-8") as f:
+                            f.write("")
+                        self.engine.output_filename = path
+                        break
+                    except OSError as e:
+                        messagebox.showerror(
+                            "Ошибка",
+                            f"Не удалось создать файл:\n{e}\n\nПопробуйте выбрать другой путь."
+                        )
+                        continue
+                else:
+                    continue
+
+    # ==========================
+    # GUI
+    # ==========================
+    def create_widgets(self):
+        # Описание
+        top_frame = tk.Frame(self, padx=10, pady=10)
+        top_frame.pack(fill=tk.X)
+
+        desc = (
+
+            "Выберите спутники, задайте интервал и нажмите Старт."
+        )
+        tk.Label(top_frame, text=desc, justify="left").pack(anchor="w")
+
+        # ---- Спутники ----
+        sats_frame = tk.LabelFrame(self, text="Спутники", padx=10, pady=10)
+        sats_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+
+        self.sat_list = SatelliteList(sats_frame, self.engine.store, on_change=self.save_settings)
+        self.sat_list.pack(fill=tk.BOTH, expand=True)
+
+        # Кнопки выбора
+        btn_sel_frame = tk.Frame(sats_frame)
+        btn_sel_frame.pack(fill=tk.X, pady=(5, 0))
+
+        tk.Button(
+            btn_sel_frame,
+            text="Выбрать найденные",
+            command=self.select_all_sats
+        ).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(0, 5))
+
+        tk.Button(
+            btn_sel_frame,
+            text="Снять найденные",
+            command=self.deselect_all_sats
+        ).pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(5, 0))
+
+        # Управление списком спутников
+        tk.Button(
+            sats_frame,
+            text="Управление списком спутников...",
+            command=self.open_satellite_manager
+        ).pack(anchor="w", pady=(8, 0))
+
+        # ---- Файл вывода ----
+        file_frame = tk.Frame(self, padx=10, pady=5)
+        file_frame.pack(fill=tk.X)
+
+        tk.Label(file_frame, text="Файл для записи данных:").pack(anchor="w")
+        self.lbl_output = tk.Label(file_frame, text=self.engine.output_filename, fg="blue")
+        self.lbl_output.pack(anchor="w")
+
+        tk.Button(
+            file_frame,
+            text="Файл...",
+            command=self.change_output_file
+        ).pack(anchor="w", pady=(5, 0))
+
+        # ---- Интервал ----
+        interval_frame = tk.LabelFrame(self, text="Интервал автообновления", padx=10, pady=10)
+        interval_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+
+        tk.Label(interval_frame, text="Каждые:").grid(row=0, column=0, sticky="w")
+
+        self.entry_interval = tk.Entry(interval_frame, width=6)
+        self.entry_interval.insert(0, "10")
+        self.entry_interval.grid(row=0, column=1, sticky="w", padx=(5, 5))
+
+        self.interval_unit = tk.StringVar(value="минут")
+        combo = ttk.Combobox(
+            interval_frame,
+            textvariable=self.interval_unit,
+            values=["секунд", "минут", "часов"],
+            state="readonly",
+            width=8
+        )
+        combo.grid(row=0, column=2, sticky="w")
+
+        tk.Label(interval_frame, text="Потоков:").grid(row=1, column=0, sticky="w", pady=(5, 0))
+
+        self.spin_parallel = tk.Spinbox(interval_frame, from_=1, to=MAX_PARALLEL_LIMIT, width=5)
+        self.spin_parallel.grid(row=1, column=1, sticky="w", padx=(5, 5), pady=(5, 0))
+
+        # ---- Старт/Стоп + Обновить сейчас ----
+        control_frame = tk.Frame(self, padx=10, pady=10)
+        control_frame.pack(fill=tk.X)
+
+        self.btn_start_stop = tk.Button(
+            control_frame,
+            text="Старт автообновления",
+            command=self.toggle_auto
+        )
+        self.btn_start_stop.pack(fill=tk.X)
+
+        tk.Button(
+            control_frame,
+            text="Обновить сейчас (разово)",
+            command=self.start_manual_download
+        ).pack(fill=tk.X, pady=(5, 0))
+
+        # ---- Статус ----
+        status_frame = tk.LabelFrame(self, text="Статус", padx=10, pady=10)
+        status_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+
+        self.indicator_canvas = tk.Canvas(status_frame, width=20, height=20, highlightthickness=0)
+        self.indicator_canvas.grid(row=0, column=0, rowspan=2, padx=(0, 10))
+        self.indicator_id = self.indicator_canvas.create_oval(2, 2, 18, 18, fill="gray", outline="black")
+
+        self.lbl_status = tk.Label(status_frame, text="Остановлено", fg="gray")
+        self.lbl_status.grid(row=0, column=1, sticky="w")
+
+        self.lbl_timer = tk.Label(status_frame, text="До следующего обновления: —")
+        self.lbl_timer.grid(row=1, column=1, sticky="w")
+
+        self.lbl_limiter = tk.Label(status_frame, text="Лимит запросов: —", fg="gray", justify="left")
+        self.lbl_limiter.grid(row=2, column=1, sticky="w")
+
+        # ---- Статистика последнего цикла ----
+        stats_frame = tk.LabelFrame(self, text="Статистика цикла", padx=10, pady=5)
+        stats_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+
+        self.lbl_stats = tk.Label(stats_frame, text="Циклов ещё не было.", fg="gray", justify="left", anchor="w")
+        self.lbl_stats.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        tk.Button(stats_frame, text="Подробнее...", command=self.open_stats_window).pack(side=tk.RIGHT)
+        self.last_metrics = None
+
+        # ---- Лог ----
+        log_frame = tk.LabelFrame(self, text="Лог", padx=10, pady=10)
+        log_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+
+        self.log_text = scrolledtext.ScrolledText(log_frame, wrap=tk.WORD, state="disabled")
+        self.log_text.pack(fill=tk.BOTH, expand=True)
+
+        self.set_indicator("gray", "Остановлено")
+
+    def apply_settings_to_gui(self):
+        if hasattr(self, "lbl_output"):
+            self.lbl_output.config(text=self.engine.output_filename)
+
+        if self.interval_value_setting is not None:
+            self.entry_interval.delete(0, tk.END)
+            self.entry_interval.insert(0, self.interval_value_setting)
+        if self.interval_unit_setting is not None:
+            self.interval_unit.set(self.interval_unit_setting)
+
+        self.spin_parallel.delete(0, tk.END)
+        self.spin_parallel.insert(0, str(self.engine.max_parallel))
+
+        if self.selected_sats_setting is not None and hasattr(self, "sat_list"):
+            self.sat_list.set_selected(self.selected_sats_setting)
+
+    # ==========================
+    # УПРАВЛЕНИЕ СПУТНИКАМИ
+    # ==========================
+    def build_sat_checkbuttons(self):
+        """Обновить список выбора после изменения списка спутников."""
+        self.sat_list.refresh()
+        # Если ничего не выбрано — выбираем все (как при первом запуске)
+        if not self.sat_list.selected:
+            self.sat_list.set_selected(self.engine.store.names())
+
+    def open_satellite_manager(self):
+        win = tk.Toplevel(self)
+        win.title("Управление спутниками")
+        win.resizable(False, False)
+        win.grab_set()
+        win.transient(self)
+
+        main_frame = tk.Frame(win, padx=10, pady=10)
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        # Список
+        left_frame = tk.Frame(main_frame)
+        left_frame.grid(row=0, column=0, sticky="nsw")
+
+        tk.Label(left_frame, text="Список спутников:").pack(anchor="w")
+
+        lb = tk.Listbox(left_frame, height=10, width=30)
+        lb.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        for name in self.engine.store.names():
+            lb.insert(tk.END, name)
+
+        scroll = tk.Scrollbar(left_frame, command=lb.yview)
+        scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        lb.config(yscrollcommand=scroll.set)
+
+        # Редактирование
+        right_frame = tk.Frame(main_frame, padx=10)
+        right_frame.grid(row=0, column=1, sticky="nsew")
+
+        tk.Label(right_frame, text="Название:").grid(row=0, column=0, sticky="w")
+        entry_name = tk.Entry(right_frame, width=40)
+        entry_name.grid(row=0, column=1, sticky="w")
+
+        tk.Label(right_frame, text="URL:").grid(row=1, column=0, sticky="w", pady=(5, 0))
+        entry_url = tk.Entry(right_frame, width=40)
+        entry_url.grid(row=1, column=1, sticky="w", pady=(5, 0))
+
+        btn_frame = tk.Frame(right_frame, pady=10)
+        btn_frame.grid(row=2, column=0, columnspan=2, sticky="w")
+
+        def on_select(event=None):
+            idxs = lb.curselection()
+            if not idxs:
+                return
+            idx = idxs[0]
+            sat = self.engine.store.records[idx]
+            entry_name.delete(0, tk.END)
+            entry_name.insert(0, sat.name)
+            entry_url.delete(0, tk.END)
+            entry_url.insert(0, sat.url)
+
+        lb.bind("<<ListboxSelect>>", on_select)
+
+        def add_satellite():
+            name = entry_name.get().strip()
+            url = entry_url.get().strip()
+            if not name or not url:
+                messagebox.showerror("Ошибка", "Введите название и URL спутника.")
+                return
+            try:
+                self.engine.store.add(name, url)
+            except ValueError as e:
+                messagebox.showerror("Ошибка", str(e))
+                return
+            lb.insert(tk.END, name)
+            entry_name.delete(0, tk.END)
+            entry_url.delete(0, tk.END)
+            self.log(f"Добавлен спутник: {name}")
+            self.save_settings()
+
+        def save_satellite():
+            idxs = lb.curselection()
+            if not idxs:
+                messagebox.showinfo("Информация", "Выберите спутник в списке слева.")
+                return
+            idx = idxs[0]
+            name = entry_name.get().strip()
+            url = entry_url.get().strip()
+            if not name or not url:
+                messagebox.showerror("Ошибка", "Название и URL не могут быть пустыми.")
+                return
+            old_name = self.engine.store.records[idx].name
+            try:
+                self.engine.store.update(idx, name, url)
+            except ValueError as e:
+                messagebox.showerror("Ошибка", str(e))
+                return
+            # Переименованный спутник остаётся выбранным
+            if old_name != name and old_name in self.sat_list.selected:
+                self.sat_list.selected.discard(old_name)
+                self.sat_list.selected.add(name)
+            lb.delete(idx)
+            lb.insert(idx, name)
+            self.log(f"Изменён спутник: {name}")
+            self.save_settings()
+
+        def delete_satellite():
+            idxs = lb.curselection()
+            if not idxs:
+                messagebox.showinfo("Информация", "Выберите спутник для удаления.")
+                return
+            idx = idxs[0]
+            sat = self.engine.store.records[idx]
+            ok = messagebox.askyesno(
+                "Подтверждение",
+                f"Удалить спутник:\n{sat.name}?"
+            )
+            if not ok:
+                return
+            self.log(f"Удалён спутник: {sat.name}")
+            self.engine.store.remove(idx)
+            lb.delete(idx)
+            entry_name.delete(0, tk.END)
+            entry_url.delete(0, tk.END)
+            self.save_settings()
+
+        tk.Button(btn_frame, text="Добавить как новый", command=add_satellite).grid(row=0, column=0, sticky="w")
+        tk.Button(btn_frame, text="Сохранить изменения", command=save_satellite).grid(row=0, column=1, sticky="w", padx=(5, 0))
+        tk.Button(btn_frame, text="Удалить", command=delete_satellite).grid(row=0, column=2, sticky="w", padx=(5, 0))
+
+        # ---- Импорт ----
+        import_frame = tk.LabelFrame(right_frame, text="Импорт", padx=5, pady=5)
+        import_frame.grid(row=3, column=0, columnspan=2, sticky="we")
+        import_buttons = []
+
+        def run_import(load, group=None):
+            """Разобрать/скачать список в фоне, добавить в хранилище в потоке Tk."""
+            for btn in import_buttons:
+                btn.config(state="disabled")
+
+            def finish(entries, error):
+                if win.winfo_exists():
+                    for btn in import_buttons:
+                        btn.config(state="normal")
+                if error is not None:
+                    self.log(f"✖ Ошибка импорта: {error}")
+                    messagebox.showerror("Ошибка импорта", str(error), parent=win if win.winfo_exists() else self)
+                    return
+
+                added, duplicates = self.engine.import_satellites(entries, group)
+                if win.winfo_exists() and added:
+                    lb.insert(tk.END, *added)
+                self.sat_list.selected.update(added)
+                self.build_sat_checkbuttons()
+                self.save_settings()
+                messagebox.showinfo(
+                    "Импорт",
+                    f"Найдено спутников: {len(entries)}\nДобавлено: {len(added)}\nПропущено повторов: {duplicates}",
+                    parent=win if win.winfo_exists() else self
+                )
+
+            def worker(job):
+                try:
+                    entries = load()
+                except (OSError, ValueError, HostBackoffError) as e:
+                    self.events.put(ImportDone(job, finish, [], e))
+                    return
+                self.events.put(ImportDone(job, finish, entries, None))
+
+            self.start_job(JOB_IMPORT, worker)
+
+        def read_text(path):
+            with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+                return f.read()
+
+        def import_group():
+            group = simpledialog.askstring("Импорт группы", "Группа Celestrak (например, starlink, weather):", parent=win)
+            if not group or not group.strip():
+                return
+            group = group.strip()
+            try:
+                group_url(group)
+            except ValueError as e:
+                messagebox.showerror("Ошибка", str(e), parent=win)
+                return
+            run_import(lambda: self.engine.fetch_group_entries(group), group.upper())
+
+        def import_csv():
+            path = filedialog.askopenfilename(
+                parent=win, title="CSV: название, номер по каталогу",
+                filetypes=[("CSV", "*.csv"), ("Text files", "*.txt"), ("All files", "*.*")]
+            )
+            if path:
+                run_import(lambda: import_entries_from_csv(read_text(path)))
+
+        def import_tle():
+            path = filedialog.askopenfilename(
+                parent=win, title="Файл TLE",
+                filetypes=[("Text files", "*.txt"), ("TLE", "*.tle"), ("All files", "*.*")]
+            )
+            if path:
+                run_import(lambda: import_entries_from_tle(read_text(path)))
+
+        for col, (text, command) in enumerate((
+            ("Группа Celestrak...", import_group),
+            ("CSV...", import_csv),
+            ("Файл TLE...", import_tle),
+        )):
+            btn = tk.Button(import_frame, text=text, command=command)
+            btn.grid(row=0, column=col, sticky="w", padx=(0 if col == 0 else 5, 0))
+            import_buttons.append(btn)
+
+        def on_close():
+            self.build_sat_checkbuttons()
+            self.save_settings()
+            win.destroy()
+
+        tk.Button(right_frame, text="Закрыть", command=on_close).grid(row=4, column=0, columnspan=2, pady=(5, 0))
+
+        win.protocol("WM_DELETE_WINDOW", on_close)
+
+    def change_output_file(self):
+        path = filedialog.asksaveasfilename(
+            parent=self,
+            title="Выберите файл nu.txt",
+            initialfile=os.path.basename(self.engine.output_filename),
+            defaultextension=".txt",
+            filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
+        )
+
+        if not path:
+            return
+
+        if not os.path.exists(path):
+            create = messagebox.askyesno(
+                "Создать файл?",
+                f"Файл:\n{path}\nне существует.\nСоздать его?"
+            )
+            if create:
+                try:
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write("")
+                except Exception as e:
+                    messagebox.showerror("Ошибка", f"Не удалось создать файл:\n{e}")
+                    return
+            else:
+                return
+
+        self.engine.output_filename = path
+        self.lbl_output.config(text=self.engine.output_filename)
+        self.log(f"Выбран новый файл: {self.engine.output_filename}")
+        self.save_settings()
+
+    # ==========================
+    # ВСПОМОГАТЕЛЬНЫЕ МЕТОДЫ GUI
+    # ==========================
+    def select_all_sats(self):
+        """Выбрать все спутники, видимые при текущем поиске и группе."""
+        self.sat_list.set_view_selected(True)
+
+    def deselect_all_sats(self):
+        self.sat_list.set_view_selected(False)
+
+    def read_max_parallel(self):
+        """Прочитать число потоков из поля ввода (с ограничением диапазона)."""
+        try:
+            val = int(self.spin_parallel.get())
+        except ValueError:
+            val = self.engine.max_parallel
+        self.engine.max_parallel = max(1, min(MAX_PARALLEL_LIMIT, val))
+        self.spin_parallel.delete(0, tk.END)
+        self.spin_parallel.insert(0, str(self.engine.max_parallel))
+        return self.engine.max_parallel
+
+    def log(self, msg: str):
+        """Добавить строку в лог. Можно вызывать из любого потока."""
+        timestamp = time.strftime("%H:%M:%S")
+        self.events.put(LogEvent(f"[{timestamp}] {msg}\n"))
+        if self.log_file is not None:
+            self.log_file.info(msg)
+        # Рабочие потоки пишут только во время задач, когда очередь и так
+        # разбирается; сообщения из потока Tk будят разбор сами
+        if threading.current_thread() is threading.main_thread():
+            self.wake_pump()
+
+    def wake_pump(self):
+        """Запланировать разбор очереди событий (только из потока Tk)."""
+        if self.pump_job is None:
+            self.pump_job = self.after(EVENT_PUMP_MS, self.pump_events)
+
+    def pump_events(self):
+        """
+        Разобрать накопившиеся события рабочих потоков (по таймеру Tk).
+        Подряд идущие строки лога выводятся одной вставкой. Перед любым
+        другим событием выводятся строки, пришедшие до него: обработчик
+        может открыть модальное окно, во время которого вложенный разбор
+        выведет более новые строки. Таймер перезапускается, только пока
+        есть фоновые задачи.
+        """
+        self.pump_job = None
+        lines = []
+        try:
+            while True:
+                event = self.events.get_nowait()
+                if type(event) is LogEvent:
+                    lines.append(event.text)
+                    continue
+                if lines:
+                    self.append_log_lines(lines)
+                    lines = []
+                self.event_handlers[type(event)](event)
+        except queue.Empty:
+            pass
+
+        if lines:
+            self.append_log_lines(lines)
+
+        if self.jobs:
+            self.wake_pump()
+
+    def append_log_lines(self, lines):
+        self.log_text.config(state="normal")
+        self.log_text.insert(tk.END, "".join(lines))
+        self.log_lines += sum(line.count("\n") for line in lines)
+        # Кольцевой буфер: старые строки удаляются с начала
+        excess = self.log_lines - LOG_MAX_LINES
+        if excess > 0:
+            self.log_text.delete("1.0", f"{excess + 1}.0")
+            self.log_lines = LOG_MAX_LINES
+        self.log_text.see(tk.END)
+        self.log_text.config(state="disabled")
+
+    # ==========================
+    # ФОНОВЫЕ ЗАДАЧИ
+    # ==========================
+    @property
+    def is_downloading(self):
+        return JOB_DOWNLOAD in self.jobs.values()
+
+    def start_job(self, kind, target, *args):
+        """Запустить фоновую задачу target(job, *args) в отдельном потоке."""
+        job = next(self.job_ids)
+        self.jobs[job] = kind
+        self.job_started[job] = time.perf_counter()
+        threading.Thread(target=target, args=(job,) + args, daemon=True).start()
+        self.wake_pump()
+        return job
+
+    def on_progress(self, event):
+        if self.is_downloading and event.total:
+            self.set_indicator("yellow", f"Загрузка данных... {event.done}/{event.total}", "orange")
+
+    def on_import_done(self, event):
+        self.jobs.pop(event.job, None)
+        self.job_started.pop(event.job, None)
+        event.finish(event.entries, event.error)
+
+    def set_indicator(self, color: str, text: str, text_color: str = None):
+        if text_color is None:
+            text_color = "black"
+        self.indicator_canvas.itemconfig(self.indicator_id, fill=color)
+        self.lbl_status.config(text=text, fg=text_color)
+
+    def set_timer_label(self):
+        self.set_limiter_label()
+        if not self.auto_running or self.scheduler is None:
+            self.lbl_timer.config(text="До следующего обновления: —")
+            return
+
+        next_run_in = int(self.scheduler.next_delay() + 0.5)
+        if next_run_in <= 0:
+            self.lbl_timer.config(text="До следующего обновления: сейчас")
+        else:
+            txt = format_duration(next_run_in)
+            self.lbl_timer.config(text=f"До следующего обновления: {txt}")
+
+    def set_limiter_label(self):
+        """Показать состояние ограничителя частоты для серверов."""
+        parts = []
+        for host, tokens, burst, rate, backoff, level in self.engine.rate_limiter.snapshot():
+            pause = format_duration(backoff) if backoff > 0 else "—"
+            parts.append(f"{host}: {rate:.1f} запр/с, токенов {tokens:.1f}/{burst}, пауза {pause}, уровень {level}")
+        self.lbl_limiter.config(text="\n".join(parts) if parts else "Лимит запросов: —")
+
+    # ==========================
+    # АВТООБНОВЛЕНИЕ
+    # ==========================
+    def toggle_auto(self):
+        if self.auto_running:
+            self.auto_running = False
+            self.scheduler = None
+            self.btn_start_stop.config(text="Старт автообновления")
+            self.set_indicator("gray", "Остановлено", "gray")
+            self.set_timer_label()
+            if self.timer_job is not None:
+                self.after_cancel(self.timer_job)
+                self.timer_job = None
+            self.log("Автообновление остановлено.")
+            self.save_settings()
+        else:
+            val = self.entry_interval.get().strip()
+            unit = self.interval_unit.get()
+            try:
+                interval_seconds = interval_to_seconds(val, unit)
+            except ValueError as e:
+                messagebox.showerror("Ошибка", str(e))
+                return
+
+            selected_sats = self.sat_list.selected_names()
+            if not selected_sats:
+                messagebox.showerror("Ошибка", "Не выбрано ни одного спутника.")
+                return
+
+            group_schedules = parse_group_schedules(self.engine.group_schedules)
+            self.scheduler = build_scheduler(interval_seconds, group_schedules)
+            self.auto_running = True
+            self.btn_start_stop.config(text="Стоп автообновления")
+            self.set_indicator("green", "Автообновление включено", "green")
+            self.log(f"Автообновление запущено. Интервал: {val} {unit}.")
+            for group, seconds in group_schedules:
+                self.log(f"  Группа {group}: каждые {format_duration(seconds)}.")
+            self.save_settings()
+            self.run_scheduler()
+
+    def run_scheduler(self):
+        """
+        Запустить подошедшие по расписанию обновления и заснуть до
+        ближайшего срока. Пока отсчёт виден на экране, просыпается раз в
+        секунду, чтобы обновлять его; иначе — только к сроку (но не реже
+        SCHEDULE_WAKE_MAX, чтобы заметить спящий режим компьютера).
+        """
+        if self.timer_job is not None:
+            self.after_cancel(self.timer_job)
+        self.timer_job = None
+        if not self.auto_running:
+            return
+
+        if not self.is_downloading:
+            due = self.scheduler.due_schedules()
+            if due:
+                for schedule in due:
+                    missed = self.scheduler.advance(schedule)
+                    if missed:
+                        self.log(
+                            f"Расписание «{schedule.name}»: пропущено циклов: {missed} "
+                            f"(спящий режим?) — выполняется одно обновление."
+                        )
+                self.start_auto_download(due)
+
+        if self.is_downloading:
+            # Следующий запуск планируется по окончании загрузки
+            wake = SCHEDULE_WAKE_MAX
+        else:
+            wake = min(self.scheduler.next_delay(), SCHEDULE_WAKE_MAX)
+        if self.lbl_timer.winfo_viewable():
+            self.set_timer_label()
+            wake = min(wake, 1.0)
+
+        self.timer_job = self.after(max(50, int(wake * 1000)), self.run_scheduler)
+
+    def on_map(self, event):
+        # Окно снова на экране — сразу обновить отсчёт
+        if event.widget is self and self.auto_running:
+            self.run_scheduler()
+
+    # ==========================
+    # ЗАПУСК ЗАГРУЗОК
+    # ==========================
+    def start_manual_download(self):
+        if self.is_downloading:
+            messagebox.showinfo("Информация", "Загрузка уже выполняется.")
+            return
+
+        selected_sats = self.sat_list.selected_names()
+        if not selected_sats:
+            messagebox.showerror("Ошибка", "Не выбрано ни одного спутника.")
+            return
+
+        self.log("Ручное обновление TLE-данных.")
+        self.run_download(selected_sats, is_manual=True)
+
+    def start_auto_download(self, due):
+        if self.is_downloading:
+            return
+        selected_sats = self.sat_list.selected_names()
+        due_names = self.scheduler.names_due(due, selected_sats, self.engine.store)
+        if not due_names:
+            self.log("Автообновление: нет выбранных спутников, пропуск.")
+            return
+
+        names = ", ".join(schedule.name for schedule in due)
+        self.log(f"Автообновление TLE-данных (расписание: {names}).")
+        self.run_download(selected_sats, is_manual=False, due_names=due_names)
+
+    def run_download(self, selected_sats, is_manual: bool, due_names=None):
+        if self.is_downloading:
+            return
+
+        self.read_max_parallel()
+        self.set_indicator("yellow", "Загрузка данных...", "orange")
+        self.start_job(JOB_DOWNLOAD, self.download_worker, list(selected_sats), is_manual, due_names)
+
+    def download_worker(self, job, selected_sats, is_manual, due_names):
+        """
+        Рабочий поток загрузки: итог передаётся событием DownloadDone.
+        Событие отправляется и при сбое цикла — иначе задача осталась бы
+        в self.jobs навсегда, и автообновление больше не запускалось бы.
+        """
+        result = DownloadResult(0, RESULT_ERROR, None)
+        try:
+            result = self.engine.download_tles(selected_sats, is_manual, due_names)
+        except Exception as e:
+            if self.log_file is not None:
+                self.log_file.exception("Сбой цикла загрузки")
+            self.log(f"✖ Сбой цикла загрузки: {type(e).__name__}: {e}")
+            result = DownloadResult(0, RESULT_ERROR, f"{type(e).__name__}: {e}")
+        finally:
+            self.events.put(DownloadDone(job, is_manual, result))
+
+    def on_download_done(self, event):
+        """Применить итог загрузки (в потоке Tk)."""
+        self.jobs.pop(event.job, None)
+        started = self.job_started.pop(event.job, None)
+        cooldown = event.result.cooldown
+        self.set_limiter_label()
+        if event.result.metrics is not None:
+            elapsed = time.perf_counter() - started if started is not None else None
+            self.show_cycle_stats(event.result.metrics, elapsed)
+        self.save_settings()
+
+        if event.is_manual:
+            self.show_download_result(event.result)
+
+        if not self.auto_running:
+            self.set_indicator("gray", "Остановлено", "gray")
+        elif event.is_manual:
+            self.set_indicator("green", "Автообновление включено", "green")
+        elif cooldown and cooldown > 0:
+            self.scheduler.postpone(cooldown)
+            self.set_indicator("yellow", "Пауза (сервер ограничил запросы)", "orange")
+        else:
+            self.set_indicator("green", "Автообновление включено", "green")
+
+        # Пока шла загрузка, мог подойти срок другого расписания
+        if self.auto_running:
+            self.run_scheduler()
+
+    # ==========================
+    # СТАТИСТИКА
+    # ==========================
+    def show_cycle_stats(self, metrics, elapsed=None):
+        """Краткая сводка последнего цикла в панели статистики."""
+        self.last_metrics = metrics
+        hits = metrics.cache_count(CACHE_HIT)
+        misses = metrics.cache_count(CACHE_MISS)
+        shared = metrics.cache_count(CACHE_SHARED)
+        sats = ", ".join(f"{k} {v}" for k, v in sorted(metrics.satellites.items())) or "—"
+        lines = [
+            f"Цикл {metrics.duration:.2f} с (загрузка {metrics.fetch:.2f}, запись {metrics.write:.3f})"
+            + (f", с очередью окна {elapsed:.2f} с" if elapsed is not None else ""),
+            f"Запросов {len(metrics.requests)}: 304 — {hits}, полных — {misses}"
+            + (f", общий кэш — {shared}" if shared else "") + "; "
+            f"получено {metrics.bytes / 1024:.1f} КБ",
+            f"Спутники: {sats}",
+        ]
+        if metrics.changes:
+            lines.append("Изменения: " + ", ".join(f"{k} {v}" for k, v in sorted(metrics.changes.items())))
+        timed = [t for t in metrics.requests if t.status != "error"]
+        if timed:
+            slowest = max(timed, key=lambda t: t.total)
+            lines.append(f"Самый медленный: {slowest.label} — {slowest.total:.2f} с")
+        self.lbl_stats.config(text="\n".join(lines), fg="black")
+
+    def open_stats_window(self):
+        """Таблица запросов последнего цикла с временем по фазам."""
+        metrics = self.last_metrics
+        if metrics is None:
+            messagebox.showinfo("Статистика", "Циклов ещё не было.")
+            return
+
+        win = tk.Toplevel(self)
+        win.title("Статистика последнего цикла")
+        win.geometry("760x400")
+        win.transient(self)
+
+        columns = ("status", "cache", "bytes", "total") + REQUEST_PHASES
+        headings = {
+            "status": "Код", "cache": "Кэш", "bytes": "Байт", "total": "Всего, мс",
+            "dns": "DNS", "connect": "Соедин.", "tls": "TLS", "first_byte": "Ответ",
+            "body": "Тело", "parse": "Разбор",
+        }
+        frame = tk.Frame(win, padx=10, pady=10)
+        frame.pack(fill=tk.BOTH, expand=True)
+        tree = ttk.Treeview(frame, columns=columns)
+        tree.heading("#0", text="Запрос")
+        tree.column("#0", width=180)
+        for col in columns:
+            tree.heading(col, text=headings[col])
+            tree.column(col, width=60, anchor="e")
+        scroll = tk.Scrollbar(frame, command=tree.yview)
+        tree.config(yscrollcommand=scroll.set)
+        scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        for t in sorted(metrics.requests, key=lambda t: t.total, reverse=True):
+            values = [t.status, t.cache or "—", t.bytes, f"{t.total * 1000:.1f}"]
+            values += [f"{getattr(t, phase) * 1000:.1f}" for phase in REQUEST_PHASES]
+            tree.insert("", tk.END, text=t.label, values=values)
+
+        tk.Label(
+            win,
+            text=f"Цикл: {metrics.duration:.3f} с, загрузка {metrics.fetch:.3f} с, запись {metrics.write:.3f} с",
+            anchor="w"
+        ).pack(fill=tk.X, padx=10, pady=(0, 10))
+
+    def show_download_result(self, result):
+        """Сообщить пользователю итог ручного обновления."""
+        path = self.engine.output_filename
+        if result.status == RESULT_WRITTEN:
+            messagebox.showinfo("Готово", f"Данные записаны в\n{path}")
+        elif result.status == RESULT_UNCHANGED:
+            messagebox.showinfo("Готово", f"Данные в\n{path}\nуже актуальны.")
+        elif result.status == RESULT_WRITE_ERROR:
+            messagebox.showerror("Ошибка", f"Не удалось записать файл:\n{result.error}")
+        elif result.status == RESULT_ERROR:
+            messagebox.showerror("Ошибка", f"Сбой загрузки:\n{result.error}")
+        else:
+            messagebox.showwarning(
+                "Предупреждение",
+                "Нет данных для записи.\nПроверь подключение к интернету или URL."
+            )
+
+
+# ==========================
+# СПЛЭШ-СКРИН И ЗАПУСК ПРИЛОЖЕНИЯ
+# ==========================
+def show_splash(master):
+    """
+    Сплэш-скрин на время инициализации главного окна.
+    Возвращает окно сплэша; закрывает его вызывающий, когда всё готово.
+    """
+    splash = tk.Toplevel(master)
+    splash.overrideredirect(True)  # без рамки и кнопок
+
+    w, h = 300, 150
+    sw = splash.winfo_screenwidth()
+    sh = splash.winfo_screenheight()
+    x = (sw - w) // 2
+    y = (sh - h) // 2
+    splash.geometry(f"{w}x{h}+{x}+{y}")
+
+    frame = tk.Frame(splash, bg="#202840")
+    frame.pack(fill="both", expand=True)
+
+    lbl_title = tk.Label(
+        frame,
+        text=f"{APP_NAME} v{APP_VERSION}",
+        fg="white",
+        bg="#202840",
+        font=("Segoe UI", 14, "bold")
+    )
+    lbl_title.pack(pady=(25, 5))
+
+    lbl_text = tk.Label(
+        frame,
+        text="Загрузка...\nПодготовка интерфейса...",
+        fg="white",
+        bg="#202840",
+        font=("Segoe UI", 10)
+    )
+    lbl_text.pack(pady=(0, 10))
+
+    # Можно добавить маленький "индикатор"
+    dot_label = tk.Label(frame, text="● ● ●", fg="lightgray", bg="#202840", font=("Segoe UI", 12))
+    dot_label.pack()
+
+    # Отрисовать сплэш сразу, не дожидаясь mainloop
+    splash.update()
+    return splash
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pytest
+
+# Модули программы лежат в корне репозитория, без пакета
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nuBench import FIRST_CATNR, MockCelestrak  # noqa: E402
+from nuCore import HttpCache, TleArchive, TleEngine  # noqa: E402
+
+# Спутников в тестовом каталоге
+SATS = 5
+
+
+@pytest.fixture
+def mock():
+    server = MockCelestrak(SATS)
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def log_lines():
+    return []
+
+
+@pytest.fixture
+def engine(mock, tmp_path, log_lines):
+    """Движок с каталогом SATS спутников на mock-сервере; все файлы в tmp_path."""
+    engine = TleEngine(log=lambda message, *args, **kwargs: log_lines.append(message))
+    engine.output_filename = str(tmp_path / "nu.txt")
+    engine.state_file = str(tmp_path / "state.json")
+    engine.http_cache = HttpCache(str(tmp_path / "cache.json"))
+    engine.archive = TleArchive(str(tmp_path / "archive"))
+    engine.bulk_catalog_urls = []
+    engine.store.load_list(
+        {"name": f"BENCH {c}", "url": f"{mock.base_url}?CATNR={c}&FORMAT=TLE"}
+        for c in range(FIRST_CATNR, FIRST_CATNR + SATS)
+    )
+    engine.open()
+    yield engine
+    engine.close()
+    if engine.http_session is not None:
+        engine.http_session.close()
@@ -0,0 +1,149 @@
+"""Архив TLE: запись и поиск, дополнение последнего куска, восстановление после сбоя."""
+import os
+
+import pytest
+
+import nuCore
+from nuBench import mock_tle
+from nuCore import TleArchive, block_epoch
+
+
+def blocks_for(catnrs, epoch_day):
+    return [mock_tle(catnr, epoch_day) for catnr in catnrs]
+
+
+def chunk_count(archive):
+    """Число кусков в файле данных (по заголовкам)."""
+    if not os.path.exists(archive.data_path):
+        return 0
+    count = 0
+    offset = 0
+    size = os.path.getsize(archive.data_path)
+    with open(archive.data_path, "rb") as f:
+        while offset < size:
+            f.seek(offset)
+            _, length, _ = nuCore._ARCHIVE_CHUNK.unpack(f.read(nuCore._ARCHIVE_CHUNK.size))
+            offset += nuCore._ARCHIVE_CHUNK.size + length
+            count += 1
+    return count
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return TleArchive(str(tmp_path))
+
+
+def test_round_trip_lookup_and_history(archive, tmp_path):
+    assert archive.append(blocks_for([25544, 20580], 100.5)) == 2
+    assert archive.append(blocks_for([25544], 101.5)) == 1
+    first = block_epoch(mock_tle(25544, 100.5))
+    second = block_epoch(mock_tle(25544, 101.5))
+
+    assert archive.lookup("25544", first - 1) is None
+    epoch, block = archive.lookup("25544", first + 3600)
+    assert epoch == first
+    assert block.splitlines()[1] == mock_tle(25544, 100.5).splitlines()[1]
+    assert archive.lookup(25544, second + 1)[0] == second
+    assert [e for e, _ in archive.history("25544")] == [first, second]
+    assert [e for e, _ in archive.history("25544", start=second)] == [second]
+    assert archive.stats() == (2, 3)
+
+    reopened = TleArchive(str(tmp_path))
+    assert reopened.stats() == (2, 3)
+    assert reopened.lookup("20580", second)[0] == first
+
+
+def test_duplicates_are_not_written(archive):
+    assert archive.append(blocks_for([25544], 100.5) * 2) == 1
+    size = os.path.getsize(archive.tail_path)
+    assert archive.append(blocks_for([25544], 100.5)) == 0
+    assert os.path.getsize(archive.tail_path) == size
+
+
+def test_small_cycles_fill_whole_chunks(archive, monkeypatch, tmp_path):
+    monkeypatch.setattr(nuCore, "ARCHIVE_CHUNK_RECORDS", 4)
+    for day in range(10):
+        archive.append(blocks_for([25544], 100.5 + day))
+    assert chunk_count(archive) == 2
+    assert len(archive.tail) == 2
+
+    reopened = TleArchive(str(tmp_path))
+    assert len(reopened.history("25544")) == 10
+    reopened.append(blocks_for([25544, 20580], 200.5))
+    assert chunk_count(reopened) == 3
+    assert not os.path.exists(reopened.tail_path)
+    assert len(TleArchive(str(tmp_path)).history("25544")) == 11
+
+
+def test_committed_bytes_are_never_rewritten(archive, monkeypatch):
+    monkeypatch.setattr(nuCore, "ARCHIVE_CHUNK_RECORDS", 4)
+    archive.append([mock_tle(25544, 100.5 + day) for day in range(4)])
+    previous = b""
+    for day in range(4, 24):
+        archive.append(blocks_for([25544], 100.5 + day))
+        with open(archive.data_path, "rb") as f:
+            data = f.read()
+        assert data.startswith(previous)
+        previous = data
+
+
+def test_missing_index_is_rebuilt(archive, monkeypatch, tmp_path):
+    monkeypatch.setattr(nuCore, "ARCHIVE_CHUNK_RECORDS", 8)
+    archive.append(blocks_for(range(10000, 10020), 100.5))
+    os.remove(archive.index_path)
+    reopened = TleArchive(str(tmp_path))
+    assert reopened.stats() == (20, 20)
+    assert os.path.getsize(reopened.index_path) == 16 * nuCore._ARCHIVE_ENTRY.size
+
+
+def test_truncated_chunk_and_index_are_recovered(archive, monkeypatch, tmp_path):
+    monkeypatch.setattr(nuCore, "ARCHIVE_CHUNK_RECORDS", 2)
+    archive.append(blocks_for([25544, 20580], 100.5))
+    # Сбой во время сжатия куска: мусор после данных и половина записи индекса
+    with open(archive.data_path, "ab") as f:
+        f.write(b"NUA1\x00\x01garbage")
+    with open(archive.index_path, "ab") as f:
+        f.write(b"\x01" * (nuCore._ARCHIVE_ENTRY.size // 2))
+
+    reopened = TleArchive(str(tmp_path))
+    assert reopened.stats() == (2, 2)
+    assert reopened.append(blocks_for([25544, 20580], 101.5)) == 2
+    assert os.path.getsize(reopened.index_path) == 4 * nuCore._ARCHIVE_ENTRY.size
+    assert chunk_count(reopened) == 2
+
+    again = TleArchive(str(tmp_path))
+    assert again.stats() == (2, 4)
+    assert len(again.history("25544")) == 2
+
+
+def test_torn_tail_write_keeps_earlier_records(archive, tmp_path):
+    for day in range(100):
+        archive.append(blocks_for([25544], 100.5 + day))
+    # Сбой посреди дописывания журнала: заголовок и половина записи
+    record = archive._tail_record(mock_tle(25544, 300.5))
+    with open(archive.tail_path, "ab") as f:
+        f.write(record[:len(record) // 2])
+
+    reopened = TleArchive(str(tmp_path))
+    assert reopened.stats() == (1, 100)
+    assert reopened.append(blocks_for([25544], 300.5)) == 1
+    assert TleArchive(str(tmp_path)).stats() == (1, 101)
+
+
+def test_tail_left_after_sealing_is_not_duplicated(archive, monkeypatch, tmp_path):
+    monkeypatch.setattr(nuCore, "ARCHIVE_CHUNK_RECORDS", 4)
+    archive.append(blocks_for([25544], 100.5))
+    archive.append(blocks_for([25544], 101.5))
+    archive.append(blocks_for([25544], 102.5))
+    with open(archive.tail_path, "rb") as f:
+        tail = f.read()
+    archive.append(blocks_for([25544, 20580], 103.5))
+    # Сбой после записи индекса, до замены журнала: старый журнал на месте
+    with open(archive.tail_path, "wb") as f:
+        f.write(tail + archive._tail_record(mock_tle(20580, 103.5)))
+
+    reopened = TleArchive(str(tmp_path))
+    assert reopened.stats() == (2, 5)
+    assert len(reopened.tail) == 1
+    assert reopened.lookup("20580", block_epoch(mock_tle(20580, 103.5)))[0] == block_epoch(mock_tle(20580, 103.5))
+    assert TleArchive(str(tmp_path)).stats() == (2, 5)
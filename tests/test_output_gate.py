@@ -0,0 +1,100 @@
+"""Отчёт об изменениях и пропуск записи файла вывода без изменений."""
+import os
+
+import pytest
+
+import nuCore
+from conftest import SATS
+from nuBench import mock_tle
+from nuCore import (
+    CHANGE_NEW, CHANGE_SAME, CHANGE_STALE, CHANGE_UPDATED,
+    RESULT_UNCHANGED, RESULT_WRITTEN,
+    ChangeReport, maneuver_hints, tle_checksum,
+)
+
+
+def with_line2(block, line2):
+    name, line1, _ = block.splitlines()
+    line2 = line2[:68]
+    return f"{name}\n{line1}\n{line2}{tle_checksum(line2)}\n"
+
+
+def test_maneuver_hints_on_orbit_raise():
+    old = mock_tle(25544, 100.5)
+    line2 = old.splitlines()[2]
+    new = with_line2(mock_tle(25544, 101.5), line2[:52] + "15.40000000" + line2[63:])
+    hints = maneuver_hints(old, new)
+    assert len(hints) == 1 and hints[0].startswith("Δa +")
+    # Обратный порядок эпох подсказок не даёт
+    assert maneuver_hints(new, old) == []
+    assert maneuver_hints(old, mock_tle(25544, 101.5)) == []
+
+
+def test_change_report_marks_only_changed_satellites_dirty():
+    report = ChangeReport()
+    report.add("A", None, mock_tle(1, 100.5))
+    report.add("B", mock_tle(2, 100.5), mock_tle(2, 100.5))
+    report.add("C", mock_tle(3, 100.5), mock_tle(3, 101.5))
+    report.add_unchanged("D")
+    report.add_stale("E")
+    assert report.dirty == {"A", "C"}
+    assert report.counts() == {CHANGE_NEW: 1, CHANGE_UPDATED: 1, CHANGE_SAME: 2, CHANGE_STALE: 1}
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    """Пути, которые движок передал в write_if_changed."""
+    calls = []
+    original = nuCore.write_if_changed
+
+    def recording(path, text):
+        calls.append(path)
+        return original(path, text)
+
+    monkeypatch.setattr(nuCore, "write_if_changed", recording)
+    return calls
+
+
+def test_unchanged_cycle_skips_the_output_file(engine, writes):
+    names = engine.store.names()
+    assert engine.download_tles(names, is_manual=True).status == RESULT_WRITTEN
+    mtime = os.stat(engine.output_filename).st_mtime_ns
+    writes.clear()
+
+    assert engine.download_tles(names, is_manual=True).status == RESULT_UNCHANGED
+    assert writes == []
+    assert os.stat(engine.output_filename).st_mtime_ns == mtime
+
+
+def test_new_epoch_rewrites_the_output_file(engine, mock):
+    names = engine.store.names()
+    engine.download_tles(names, is_manual=True)
+    mock.epoch_day += 0.25
+    result = engine.download_tles(names, is_manual=True)
+    assert result.status == RESULT_WRITTEN
+    assert result.changes.counts()[CHANGE_UPDATED] == SATS
+
+
+def test_deleted_output_file_is_restored(engine):
+    names = engine.store.names()
+    engine.download_tles(names, is_manual=True)
+    with open(engine.output_filename, encoding="utf-8") as f:
+        expected = f.read()
+    os.remove(engine.output_filename)
+
+    assert engine.download_tles(names, is_manual=True).status == RESULT_WRITTEN
+    with open(engine.output_filename, encoding="utf-8") as f:
+        assert f.read() == expected
+
+
+def test_edited_output_file_is_restored(engine):
+    names = engine.store.names()
+    engine.download_tles(names, is_manual=True)
+    with open(engine.output_filename, encoding="utf-8") as f:
+        expected = f.read()
+    with open(engine.output_filename, "w", encoding="utf-8") as f:
+        f.write("edited by hand\n")
+
+    assert engine.download_tles(names, is_manual=True).status == RESULT_WRITTEN
+    with open(engine.output_filename, encoding="utf-8") as f:
+        assert f.read() == expected
@@ -0,0 +1,91 @@
+"""Расписания автообновления: сроки, пропущенные циклы, группы."""
+import pytest
+
+from nuCore import MAIN_SCHEDULE, Scheduler
+
+
+class FakeClock:
+    """Управляемые часы: monotonic и настенные идут вместе, если не сказано иное."""
+
+    def __init__(self):
+        self.mono = 1000.0
+        self.wall = 1_700_000_000.0
+
+    def tick(self, seconds, wall_only=False):
+        if not wall_only:
+            self.mono += seconds
+        self.wall += seconds
+
+
+class FakeRecord:
+    def __init__(self, group):
+        self.group = group
+
+    def group_name(self):
+        return self.group
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def scheduler(clock):
+    return Scheduler(clock=lambda: clock.mono, wall_clock=lambda: clock.wall)
+
+
+def test_first_run_is_due_immediately(scheduler):
+    main = scheduler.add(MAIN_SCHEDULE, 600)
+    assert scheduler.due_schedules() == [main]
+    assert scheduler.next_delay() == 0.0
+
+
+def test_on_time_cycle_misses_nothing_and_does_not_drift(scheduler, clock):
+    main = scheduler.add(MAIN_SCHEDULE, 600)
+    clock.tick(5)  # загрузка заняла 5 секунд
+    assert scheduler.advance(main) == 0
+    assert scheduler.next_delay() == pytest.approx(595)
+    assert scheduler.due_schedules() == []
+
+
+@pytest.mark.parametrize("late, missed", [(599, 0), (600, 1), (1799, 2), (3000, 5)])
+def test_missed_cycles_are_counted(scheduler, clock, late, missed):
+    main = scheduler.add(MAIN_SCHEDULE, 600)
+    clock.tick(late)
+    assert scheduler.advance(main) == missed
+    assert scheduler.next_delay() == pytest.approx(600 - late % 600)
+
+
+def test_sleep_is_detected_by_wall_clock(scheduler, clock):
+    main = scheduler.add(MAIN_SCHEDULE, 600)
+    scheduler.advance(main)
+    # monotonic стоял во время спящего режима, настенные часы ушли на 2 часа
+    clock.tick(7200, wall_only=True)
+    assert scheduler.due_schedules() == [main]
+    assert scheduler.next_delay() == 0.0
+    assert scheduler.advance(main) == 11
+
+
+def test_postpone_moves_only_earlier_deadlines(scheduler, clock):
+    main = scheduler.add(MAIN_SCHEDULE, 600)
+    fast = scheduler.add("fast", 60, {"starlink"})
+    scheduler.advance(main)
+    scheduler.advance(fast)
+    scheduler.postpone(120)
+    assert fast.due == pytest.approx(clock.mono + 120)
+    assert main.due == pytest.approx(clock.mono + 600)
+    assert scheduler.next_delay() == pytest.approx(120)
+
+
+def test_names_due_uses_group_schedule_or_main(scheduler):
+    main = scheduler.add(MAIN_SCHEDULE, 600)
+    fast = scheduler.add("fast", 60, {"starlink"})
+    store = {
+        "ISS": FakeRecord("stations"),
+        "STARLINK-1": FakeRecord("starlink"),
+    }
+    selected = ["ISS", "STARLINK-1", "UNKNOWN"]
+    assert scheduler.names_due([fast], selected, store) == {"STARLINK-1"}
+    assert scheduler.names_due([main], selected, store) == {"ISS"}
+    assert scheduler.names_due([main, fast], selected, store) == {"ISS", "STARLINK-1"}
@@ -0,0 +1,26 @@
+"""Общий кэш нескольких копий программы."""
+from conftest import SATS
+from nuCore import CHANGE_NEW, RESULT_WRITTEN, SharedCache
+
+
+def test_unreachable_directory_falls_back_to_direct_requests(engine, mock, tmp_path, log_lines):
+    # Папка внутри обычного файла: создать её нельзя, как и на отключённом сетевом диске
+    (tmp_path / "not-a-dir").write_text("")
+    engine.shared_cache = SharedCache(str(tmp_path / "not-a-dir" / "share"))
+
+    result = engine.download_tles(engine.store.names(), is_manual=True)
+    assert result.status == RESULT_WRITTEN
+    assert result.changes.counts()[CHANGE_NEW] == SATS
+    assert mock.counters()[0] == SATS
+    assert sum("недоступен" in line for line in log_lines) == 1
+
+
+def test_second_engine_takes_records_from_the_share(engine, mock, tmp_path):
+    engine.shared_cache = SharedCache(str(tmp_path / "share"))
+    engine.download_tles(engine.store.names(), is_manual=True)
+    requests_before = mock.counters()[0]
+
+    engine.http_cache.entries.clear()
+    engine.download_tles(engine.store.names(), is_manual=True)
+    assert mock.counters()[0] == requests_before
+    assert engine.shared_cache.stats()[0] == SATS
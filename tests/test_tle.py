@@ -0,0 +1,63 @@
+"""Контрольные суммы, проверка строк и потоковый разбор TLE."""
+import pytest
+
+from nuCore import TleStreamParser, tle_checksum, validate_tle
+
+# Пример ISS из описания формата TLE (контрольные суммы верные)
+ISS_NAME = "ISS (ZARYA)"
+ISS_LINE1 = "1 25544U 98067A   08264.51782528 -.00002182  00000-0 -11606-4 0  2927"
+ISS_LINE2 = "2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.72125391563537"
+
+
+def with_checksum(line, digit):
+    return line[:-1] + str(digit)
+
+
+def test_checksum_counts_digits_and_minus_signs():
+    assert tle_checksum(ISS_LINE1) == 7
+    assert tle_checksum(ISS_LINE2) == 7
+    assert tle_checksum("1 -" + "0" * 66) == 2
+
+
+def test_valid_pair():
+    assert validate_tle(ISS_LINE1, ISS_LINE2) is None
+
+
+@pytest.mark.parametrize("line1, line2, reason", [
+    (ISS_LINE1[:-1], ISS_LINE2, "неверная длина строки"),
+    (ISS_LINE2, ISS_LINE1, "неверный номер строки"),
+    (with_checksum(ISS_LINE1, 8), ISS_LINE2, "контрольная сумма строки 1"),
+    (ISS_LINE1, with_checksum(ISS_LINE2, 0), "контрольная сумма строки 2"),
+    (ISS_LINE1[:-1] + "X", ISS_LINE2, "контрольная сумма строки 1"),
+])
+def test_invalid_pairs(line1, line2, reason):
+    assert validate_tle(line1, line2) == reason
+
+
+def test_different_catalog_numbers_are_rejected():
+    line2 = "2 25545" + ISS_LINE2[7:]
+    line2 = with_checksum(line2, tle_checksum(line2))
+    assert validate_tle(ISS_LINE1, line2) == "разные номера по каталогу"
+
+
+def test_stream_parser_handles_chunk_boundaries_and_3le_names():
+    text = f"0 {ISS_NAME}\r\n{ISS_LINE1}\r\n{ISS_LINE2}\r\n".encode("utf-8")
+    chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+    parser = TleStreamParser()
+    records = list(parser.records(chunks))
+    assert [(r.name, r.catnr) for r in records] == [(ISS_NAME, "25544")]
+    assert parser.accepted == 1 and parser.rejected == 0
+
+
+def test_stream_parser_rejects_garbage_and_truncated_records():
+    text = (
+        "<html>Service Unavailable</html>\n"
+        f"{ISS_NAME}\n{with_checksum(ISS_LINE1, 0)}\n{ISS_LINE2}\n"
+        f"{ISS_NAME}\n{ISS_LINE1}\n{ISS_LINE2}\n"
+        f"{ISS_NAME}\n{ISS_LINE1}\n"
+    )
+    parser = TleStreamParser()
+    records = list(parser.records([text]))
+    assert len(records) == 1
+    assert parser.rejected == 2
+    assert parser.reasons == {"контрольная сумма строки 1": 1, "обрезанная запись": 1}